@@ -0,0 +1,150 @@
+'''
+/ai/llm/client.py
+-> shared Ollama client: pooled keep-alive session, per-model endpoints and timeouts
+'''
+
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+import threading
+import requests
+import queue
+import json
+import os
+
+from utilities.admission.setup import llmSlot
+
+load_dotenv()
+
+# ==================================================
+# global vars
+# ==================================================
+
+SQL_MODEL = 'sql-agent-lastro'
+ROUTER_MODEL = 'context-router-lastro'
+
+DEFAULT_OLLAMA_URL = 'http://localhost:11434/api/generate'
+OLLAMA_URL = os.getenv("OLLAMA_URL", DEFAULT_OLLAMA_URL)
+
+# generate endpoint per model (the router can live on a different host)
+MODEL_ENDPOINTS = {
+    SQL_MODEL: OLLAMA_URL,
+    ROUTER_MODEL: os.getenv("OLLAMA_ROUTER_URL", OLLAMA_URL),
+}
+
+# (connect, read) timeouts per model, in seconds
+CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", 3))
+MODEL_TIMEOUTS = {
+    SQL_MODEL: float(os.getenv("OLLAMA_SQL_TIMEOUT", 60)),
+    ROUTER_MODEL: float(os.getenv("OLLAMA_ROUTER_TIMEOUT", 30)),
+}
+
+OLLAMA_POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", 10))
+
+session = requests.Session()
+adapter = HTTPAdapter(pool_connections=2, pool_maxsize=OLLAMA_POOL_SIZE)
+session.mount('http://', adapter)
+session.mount('https://', adapter)
+
+# ==================================================
+# methods
+# ==================================================
+
+class OllamaError(Exception):
+    pass
+
+def generate(model, prompt, speculative=False, **fields):
+    """
+    Call /api/generate (non-streaming) on the model's endpoint, reusing pooled connections.
+    Extra fields (context, format, options, ...) are sent as-is.
+    Waits for a global LLM slot first (raises LLMOverloaded when saturated),
+    speculative calls only take a spare one (raises LLMBusy otherwise).
+    Returns the decoded response body.
+    """
+    payload = {
+        'model': model,
+        'prompt': prompt,
+        'stream': False,
+        'keep_alive': -1,
+        **fields
+    }
+
+    with llmSlot(speculative):
+        response = session.post(
+            MODEL_ENDPOINTS.get(model, OLLAMA_URL),
+            json=payload,
+            timeout=(CONNECT_TIMEOUT, MODEL_TIMEOUTS.get(model, 60))
+        )
+
+    if response.status_code != 200:
+        raise OllamaError(f"Ollama API error: {response.status_code}")
+
+    return response.json()
+
+def readStream(model, payload, chunks):
+    """
+    Read a whole /api/generate stream into the chunks queue, holding the LLM slot only while
+    Ollama generates (not while the caller sends the chunks on). Errors are queued too,
+    None marks the end.
+    """
+    try:
+        with llmSlot():
+            response = session.post(
+                MODEL_ENDPOINTS.get(model, OLLAMA_URL),
+                json=payload,
+                stream=True,
+                timeout=(CONNECT_TIMEOUT, MODEL_TIMEOUTS.get(model, 60))
+            )
+
+            try:
+                if response.status_code != 200:
+                    raise OllamaError(f"Ollama API error: {response.status_code}")
+
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+
+                    chunk = json.loads(line)
+                    if chunk.get('error'):
+                        raise OllamaError(f"Ollama API error: {chunk['error']}")
+
+                    chunks.put(chunk)
+
+                    if chunk.get('done'):
+                        break
+            finally:
+                response.close()
+
+    except Exception as e:
+        chunks.put(e)
+    finally:
+        chunks.put(None)
+
+def generateStream(model, prompt, **fields):
+    """
+    Call /api/generate with stream: true and yield the decoded chunks as they arrive
+    ('response' fragments, the last one has done: true and the 'context').
+    The stream is read to completion in a background thread, so a slow or gone client
+    never keeps the LLM slot.
+    """
+    payload = {
+        'model': model,
+        'prompt': prompt,
+        'stream': True,
+        'keep_alive': -1,
+        **fields
+    }
+
+    chunks = queue.Queue()
+    threading.Thread(target=readStream, args=(model, payload, chunks), name='ollama-stream', daemon=True).start()
+
+    while True:
+        chunk = chunks.get()
+        if chunk is None:
+            return
+        if isinstance(chunk, Exception):
+            raise chunk
+
+        yield chunk
+
+def closeClient():
+    session.close()
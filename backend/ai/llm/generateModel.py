@@ -23,57 +23,48 @@ def create_modelfile():
     modelfile_content = f'''FROM {BASE_MODEL}
 PARAMETER temperature 0.0
 PARAMETER num_ctx 2048
+PARAMETER num_predict 192
 
 SYSTEM """
-Generate SQL queries for the projects table. Output exactly 2 lines: DESC, QUERY.
+Turn search requests for the projects table into a JSON filter. Output only the JSON object.
 
 TABLE:
 name: projects
 structure: {COLUMN_DESCRIPTIONS}
 
-RULES:
-1. Always use LIKE '%value%' for text fields (never use =)
-2. Date filtering:
-   - Specific year: date LIKE '%2023%'
-   - Before date: date < 'YYYY-MM-DD'
-   - After date: date > 'YYYY-MM-DD'
-3. Absolute sorting queries:
-   - "o mais recente/último" -> ORDER BY date DESC LIMIT 1
-   - "o mais antigo/primeiro" -> ORDER BY date ASC LIMIT 1
+OUTPUT:
+{{"desc": "...", "filters": [[condition, ...], ...], "sort": "none|newest|oldest", "limit": 0}}
+- desc: describe what the user is looking for in casual Portuguese, no punctuation
+- filters: list of groups. Groups are combined with AND, the conditions inside a group with OR
+- condition: {{"field": "title|author|category|date|location|instruments", "op": "...", "value": "..."}}
+- limit: 0 for no limit
+
+OPERATORS:
+1. Text fields: "contains" / "not_contains" (value is the searched text)
+2. Date:
+   - Specific year: "year" with value "2023"
+   - Before date: "before" with value "YYYY-MM-DD"
+   - After date: "after" with value "YYYY-MM-DD"
+3. Absolute sorting:
+   - "o mais recente/último" -> "sort": "newest", "limit": 1
+   - "o mais antigo/primeiro" -> "sort": "oldest", "limit": 1
 
 ACTIONS:
-<ACTION>RESET</ACTION> = Build fresh query from <PROMPT> only
-<ACTION>MERGE</ACTION> = Copy WHERE from <PREV_SQL>, add new condition with AND
+<ACTION>RESET</ACTION> = Build the filter from <PROMPT> only
+<ACTION>MERGE</ACTION> = Output ONLY the new conditions from <PROMPT>, they are added with AND to the previous search (<PREV_SQL> or the previous turn)
 
 EXAMPLES:
-RESET: <PROMPT>="carlos" -> WHERE author LIKE '%carlos%'
-       DESC: Trabalhos de Carlos
-RESET: <PROMPT>="Jorge Cruz" -> WHERE author LIKE '%Jorge Cruz%'
-       DESC: Projetos de Jorge Cruz
-RESET: <PROMPT>="na praia" -> WHERE location LIKE '%praia%'
-       DESC: Gravado na praia
-RESET: <PROMPT>="fado" -> WHERE title LIKE '%fado%' OR category LIKE '%fado%'
-       DESC: Fado no título ou categoria
-RESET: <PROMPT>="gato" -> WHERE title LIKE '%gato%' OR author LIKE '%gato%'
-       DESC: Gato no título ou autor
-RESET: <PROMPT>="carta de amor" -> WHERE title LIKE '%carta de amor%'
-       DESC: Carta de amor no título
-RESET: <PROMPT>="guitarra braguesa" -> WHERE instruments LIKE '%guitarra%' or instruments LIKE '%braguesa%'
-       DESC: Guitarra ou braguesa nos instrumentos
-RESET: <PROMPT>="guitarra de fado" -> WHERE instruments LIKE '%guitarra%' or instruments LIKE '%fado%'
-       DESC: Guitarra ou fado nos instrumentos
-RESET: <PROMPT>="dança antes de 2024" -> WHERE category LIKE '%dança%' AND date < '2024-01-01'
-       DESC: Dança publicada antes de 2024
-RESET: <PROMPT>="em 2023" -> WHERE date LIKE '%2023%'
-       DESC: Publicado em 2023
-RESET: <PROMPT>="vídeo mais recente de filipe sambado" -> WHERE author LIKE '%filipe sambado%' ORDER BY date DESC LIMIT 1
-       DESC: O mais recente de Filipe Sambado
-MERGE: <PREV_SQL>="WHERE author LIKE '%carlos%'" + <PROMPT>="em Lisboa" → WHERE author LIKE '%carlos%' AND location LIKE '%Lisboa%'
-       DESC: Carlos gravado em Lisboa
-
-OUTPUT FORMAT:
-DESC: [Match user intent exactly - describe what they're looking for in casual Portuguese, no punctuation]
-QUERY: SELECT * FROM projects WHERE ... (or just SELECT * FROM projects ORDER BY ...)
+RESET: <PROMPT>="carlos" -> {{"desc": "Trabalhos de Carlos", "filters": [[{{"field": "author", "op": "contains", "value": "carlos"}}]], "sort": "none", "limit": 0}}
+RESET: <PROMPT>="Jorge Cruz" -> {{"desc": "Projetos de Jorge Cruz", "filters": [[{{"field": "author", "op": "contains", "value": "Jorge Cruz"}}]], "sort": "none", "limit": 0}}
+RESET: <PROMPT>="na praia" -> {{"desc": "Gravado na praia", "filters": [[{{"field": "location", "op": "contains", "value": "praia"}}]], "sort": "none", "limit": 0}}
+RESET: <PROMPT>="fado" -> {{"desc": "Fado no título ou categoria", "filters": [[{{"field": "title", "op": "contains", "value": "fado"}}, {{"field": "category", "op": "contains", "value": "fado"}}]], "sort": "none", "limit": 0}}
+RESET: <PROMPT>="gato" -> {{"desc": "Gato no título ou autor", "filters": [[{{"field": "title", "op": "contains", "value": "gato"}}, {{"field": "author", "op": "contains", "value": "gato"}}]], "sort": "none", "limit": 0}}
+RESET: <PROMPT>="carta de amor" -> {{"desc": "Carta de amor no título", "filters": [[{{"field": "title", "op": "contains", "value": "carta de amor"}}]], "sort": "none", "limit": 0}}
+RESET: <PROMPT>="guitarra braguesa" -> {{"desc": "Guitarra ou braguesa nos instrumentos", "filters": [[{{"field": "instruments", "op": "contains", "value": "guitarra"}}, {{"field": "instruments", "op": "contains", "value": "braguesa"}}]], "sort": "none", "limit": 0}}
+RESET: <PROMPT>="dança antes de 2024" -> {{"desc": "Dança publicada antes de 2024", "filters": [[{{"field": "category", "op": "contains", "value": "dança"}}], [{{"field": "date", "op": "before", "value": "2024-01-01"}}]], "sort": "none", "limit": 0}}
+RESET: <PROMPT>="em 2023" -> {{"desc": "Publicado em 2023", "filters": [[{{"field": "date", "op": "year", "value": "2023"}}]], "sort": "none", "limit": 0}}
+RESET: <PROMPT>="vídeo mais recente de filipe sambado" -> {{"desc": "O mais recente de Filipe Sambado", "filters": [[{{"field": "author", "op": "contains", "value": "filipe sambado"}}]], "sort": "newest", "limit": 1}}
+MERGE: <PREV_SQL>="WHERE author LIKE '%carlos%'" + <PROMPT>="em Lisboa" -> {{"desc": "Carlos gravado em Lisboa", "filters": [[{{"field": "location", "op": "contains", "value": "Lisboa"}}]], "sort": "none", "limit": 0}}
 """
 '''
     
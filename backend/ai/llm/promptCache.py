@@ -0,0 +1,127 @@
+'''
+/ai/llm/promptCache.py
+-> cache of raw model outputs keyed by (normalized prompt, action, previous SQL)
+'''
+
+from dotenv import load_dotenv
+import hashlib
+import sqlite3
+import time
+import os
+import re
+
+from database.setup import normalizeSQL
+from utilities.cache.setup import LRUCache
+
+load_dotenv()
+
+# ==================================================
+# global vars
+# ==================================================
+
+PROMPT_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", 2048))
+PROMPT_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600))
+
+# optional sqlite file, keeps the cache across restarts and shares it between workers
+PROMPT_CACHE_PATH = os.getenv("LLM_CACHE_PATH")
+
+promptCache = LRUCache(PROMPT_CACHE_SIZE, ttl=PROMPT_CACHE_TTL)
+
+diskHits = 0
+
+# ==================================================
+# keys
+# ==================================================
+
+def normalizePrompt(prompt):
+    """
+    Lighter than foldPrompt: the model sees accents and inner punctuation, so only case,
+    spacing and trailing punctuation are ignored.
+    """
+    prompt = re.sub(r'\s+', ' ', prompt or '').strip().lower()
+    return prompt.rstrip('.!?;,').strip()
+
+def buildPromptCacheKey(model, prompt, action, previousQueries=None):
+    """
+    Previous SQL only matters for MERGE, where it's part of the model input.
+    """
+    previous = ""
+    if action == 'MERGE' and previousQueries:
+        previous = "\n".join(normalizeSQL(q) for q in previousQueries)
+
+    raw = "\x1f".join([model, normalizePrompt(prompt), action, previous])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+# ==================================================
+# disk persistence
+# ==================================================
+
+def openDiskCache():
+    conn = sqlite3.connect(PROMPT_CACHE_PATH, timeout=5)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS promptCache "
+        "(key TEXT PRIMARY KEY, output TEXT NOT NULL, expiresAt REAL NOT NULL);"
+    )
+    return conn
+
+def readDisk(key):
+    conn = openDiskCache()
+    try:
+        return conn.execute(
+            "SELECT output, expiresAt FROM promptCache WHERE key = ? AND expiresAt > ?;",
+            (key, time.time())
+        ).fetchone()
+    finally:
+        conn.close()
+
+def writeDisk(key, output, expiresAt):
+    conn = openDiskCache()
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO promptCache (key, output, expiresAt) VALUES (?, ?, ?);",
+            (key, output, expiresAt)
+        )
+        conn.execute("DELETE FROM promptCache WHERE expiresAt <= ?;", (time.time(),))
+        conn.commit()
+    finally:
+        conn.close()
+
+# ==================================================
+# methods
+# ==================================================
+
+def getCachedOutput(key):
+    global diskHits
+
+    output = promptCache.get(key)
+    if output is not None or not PROMPT_CACHE_PATH:
+        return output
+
+    try:
+        row = readDisk(key)
+    except Exception as e:
+        print(f"DEBUG PROMPT CACHE: disk read failed ({e})")
+        return None
+
+    if row:
+        diskHits += 1
+        promptCache.set(key, row[0], expiresAt=row[1])
+        return row[0]
+
+    return None
+
+def setCachedOutput(key, output):
+    if not output:
+        return
+
+    expiresAt = time.time() + PROMPT_CACHE_TTL
+    promptCache.set(key, output, expiresAt=expiresAt)
+
+    if PROMPT_CACHE_PATH:
+        try:
+            writeDisk(key, output, expiresAt)
+        except Exception as e:
+            print(f"DEBUG PROMPT CACHE: disk write failed ({e})")
+
+def getPromptCacheStats():
+    return {**promptCache.stats(), "diskHits": diskHits, "persistent": bool(PROMPT_CACHE_PATH)}
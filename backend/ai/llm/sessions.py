@@ -0,0 +1,80 @@
+'''
+/ai/llm/sessions.py
+-> per-session model context: MERGE follow-ups continue from the previous turn's Ollama context instead of resending <PREV_SQL>
+'''
+
+from dotenv import load_dotenv
+import uuid
+import os
+import re
+
+from database.setup import normalizeSQL
+from utilities.cache.setup import LRUCache
+
+load_dotenv()
+
+# ==================================================
+# global vars
+# ==================================================
+
+SESSION_MAX = int(os.getenv("LLM_SESSION_MAX", 1024))
+SESSION_TTL = int(os.getenv("LLM_SESSION_TTL", 30 * 60))
+
+# sessionId -> {'context': [...], 'queries': [...]}, per worker
+sessions = LRUCache(SESSION_MAX, ttl=SESSION_TTL)
+
+sessionIdPattern = re.compile(r"^[0-9a-f]{32}$")
+
+reused = 0
+
+# ==================================================
+# methods
+# ==================================================
+
+def resolveSessionId(sessionId):
+    """
+    Keep a well-formed client session id, otherwise start a new session.
+    """
+    if isinstance(sessionId, str) and sessionIdPattern.match(sessionId):
+        return sessionId
+    return uuid.uuid4().hex
+
+def getSessionContext(sessionId, previousQueries):
+    """
+    Model context of the session's last turn, only if the client's previous SQL is what that turn produced.
+    """
+    global reused
+
+    if not sessionId or not previousQueries:
+        return None
+
+    session = sessions.get(sessionId)
+    if not session or not session['context']:
+        return None
+
+    previous = [normalizeSQL(q) for q in previousQueries if q]
+    if not previous or not all(q in session['queries'] for q in previous):
+        return None
+
+    # request threads of the worker count concurrently
+    with sessions.lock:
+        reused += 1
+    return session['context']
+
+def saveSession(sessionId, context, output):
+    """
+    Store the context returned by Ollama together with the SQL of that turn.
+    """
+    if not sessionId:
+        return
+
+    queries = [
+        normalizeSQL(line.strip()[6:])
+        for line in (output or '').split('\n')
+        if line.strip().startswith('QUERY:')
+    ]
+
+    sessions.set(sessionId, {'context': context, 'queries': queries})
+
+def getSessionStats():
+    return {**sessions.stats(), "contextReused": reused}
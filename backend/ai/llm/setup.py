@@ -1,17 +1,16 @@
 # /ai/llm/setup.py
 
-import requests
-from dotenv import load_dotenv
-import os
-
-load_dotenv()
+from ai.llm.client import SQL_MODEL, generate, generateStream
+from ai.llm.promptCache import buildPromptCacheKey, getCachedOutput, setCachedOutput
+from ai.llm.sessions import getSessionContext, saveSession
+from ai.llm.structured import GENERATION_FIELDS, compileOutput, extractDesc, previousWhere
+from utilities.admission.setup import LLMOverloaded
 
 # ==================================================
 # global vars
 # ==================================================
 
-MODEL_NAME = 'sql-agent-lastro'
-OLLAMA_URL = os.getenv("OLLAMA_URL")
+MODEL_NAME = SQL_MODEL
 
 MERGE_CONNECTORS = {'e', 'com', 'em', 'de', 'na', 'no', 'do', 'da', 'à', 'ao', 'sem', 'que'}
 NOISE_WORDS = {'enganei-me', 'queria', 'dizer', 'são', 'interessantes', 'vamos', 'ver', 'vídeos', 'projetos', 'mostra'}
@@ -41,11 +40,29 @@ def process_prompt_for_action(currentPrompt, previousQueries):
         return 'RESET'
 
 
-def queryLLM(currentPrompt, previousQueries):
+def resolveAction(currentPrompt, previousQueries):
+    """
+    MERGE only when the previous SQL is a plain query its conditions can be merged into, RESET otherwise.
+    """
     action = process_prompt_for_action(currentPrompt, previousQueries)
+    if action == 'MERGE' and previousWhere(previousQueries) is None:
+        print("DEBUG ACTION: previous SQL can't be merged into, using RESET")
+        return 'RESET'
+    return action
+
+def resolveSessionContext(currentPrompt, previousQueries, sessionId):
+    """
+    Ollama context to continue from, for MERGE turns of a known session.
+    """
+    if not sessionId or resolveAction(currentPrompt, previousQueries) != 'MERGE':
+        return None
+    return getSessionContext(sessionId, previousQueries)
+
+def formatPrompt(currentPrompt, previousQueries, context=None):
+    action = resolveAction(currentPrompt, previousQueries)
 
-    # Only include PREV_SQL if action is MERGE
-    if action == 'MERGE' and previousQueries:
+    # Only include PREV_SQL if action is MERGE, and only when the model doesn't already have it in context
+    if action == 'MERGE' and previousQueries and not context:
         previousSection = "\n".join(previousQueries)
         formattedPrompt = (
             f"<ACTION>{action}</ACTION>\n"
@@ -59,25 +76,103 @@ def queryLLM(currentPrompt, previousQueries):
         )
 
     print(f"DEBUG ACTION: {action}")
+    if context:
+        print("DEBUG SESSION: continuing from previous turn context")
     print(f"DEBUG PROMPT INJECTED:\n{formattedPrompt}")
 
+    return action, formattedPrompt
+
+def generationFields(context=None):
+    fields = dict(GENERATION_FIELDS)
+    if context:
+        fields['context'] = context
+    return fields
+
+def generateOutput(currentPrompt, previousQueries, sessionId=None, speculative=False):
+    """
+    Compiled model output and the Ollama context of the turn (None on prompt cache hits).
+    Leaves the session alone, so speculative runs that end up discarded don't overwrite it.
+    Speculative runs only take a spare LLM slot (raise LLMBusy otherwise).
+    """
+    context = resolveSessionContext(currentPrompt, previousQueries, sessionId)
+    action, formattedPrompt = formatPrompt(currentPrompt, previousQueries, context)
+
+    # temperature 0.0: same input, same output -> skip the model for repeat prompts
+    cacheKey = buildPromptCacheKey(MODEL_NAME, currentPrompt, action, previousQueries)
+    cachedOutput = getCachedOutput(cacheKey)
+
+    if cachedOutput is not None:
+        print("DEBUG PROMPT CACHE: hit")
+        return cachedOutput, None
+
     try:
-        response = requests.post(
-            OLLAMA_URL,
-            json={
-                'model': MODEL_NAME,
-                'prompt': formattedPrompt,
-                'stream': False,
-                'keep_alive': -1,
-            },
-            timeout=60
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            return result['response']
-        else:
-            raise Exception(f"Ollama API error: {response.status_code}")
-            
+        result = generate(MODEL_NAME, formattedPrompt, speculative=speculative, **generationFields(context))
+
+        # structured answers are compiled to the DESC/QUERY text here
+        output = compileOutput(result['response'], action, previousQueries)
+
+        setCachedOutput(cacheKey, output)
+        return output, result.get('context')
+
+    except LLMOverloaded:
+        raise
     except Exception as e:
-        raise Exception(f"Failed to generate SQL: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Failed to generate SQL: {str(e)}")
+
+def commitOutput(generated, sessionId):
+    """
+    Output of a generateOutput() run that is actually used, its context becomes the session's last turn.
+    """
+    output, context = generated
+    if context is not None:
+        saveSession(sessionId, context, output)
+    return output
+
+def queryLLM(currentPrompt, previousQueries, sessionId=None):
+    return commitOutput(generateOutput(currentPrompt, previousQueries, sessionId), sessionId)
+
+def queryLLMStream(currentPrompt, previousQueries, sessionId=None):
+    """
+    Same as queryLLM, but yields the DESC line as soon as the model has written it, then the compiled QUERY lines.
+    """
+    context = resolveSessionContext(currentPrompt, previousQueries, sessionId)
+    action, formattedPrompt = formatPrompt(currentPrompt, previousQueries, context)
+
+    cacheKey = buildPromptCacheKey(MODEL_NAME, currentPrompt, action, previousQueries)
+    cachedOutput = getCachedOutput(cacheKey)
+
+    if cachedOutput is not None:
+        print("DEBUG PROMPT CACHE: hit")
+        yield from cachedOutput.split('\n')
+        return
+
+    output = ''
+    desc = None
+    finalContext = None
+
+    try:
+        for chunk in generateStream(MODEL_NAME, formattedPrompt, **generationFields(context)):
+            fragment = chunk.get('response', '')
+            output += fragment
+
+            if chunk.get('done'):
+                finalContext = chunk.get('context')
+
+            # the desc comes first in the JSON, send it as soon as it's closed
+            if desc is None:
+                desc = extractDesc(output)
+                if desc is not None:
+                    yield f"DESC: {desc}"
+
+    except LLMOverloaded:
+        raise
+    except Exception as e:
+        raise Exception(f"Failed to generate SQL: {str(e)}")
+
+    output = compileOutput(output, action, previousQueries)
+    for line in output.split('\n'):
+        if desc is None or not line.startswith('DESC:'):
+            yield line
+
+    setCachedOutput(cacheKey, output)
+    saveSession(sessionId, finalContext, output)
@@ -0,0 +1,240 @@
+'''
+/ai/llm/structured.py
+-> structured SQL-agent output: JSON schema sent as Ollama `format`, compiled to the DESC/QUERY text in the backend
+'''
+
+from dotenv import load_dotenv
+import json
+import os
+import re
+
+from database.search import escapeLiteral
+
+load_dotenv()
+
+# ==================================================
+# global vars
+# ==================================================
+
+# generation budget, a full answer is well under 100 tokens
+NUM_PREDICT = int(os.getenv("LLM_NUM_PREDICT", 192))
+
+FIELDS = ['title', 'author', 'category', 'date', 'location', 'instruments']
+OPERATORS = ['contains', 'not_contains', 'year', 'before', 'after']
+SORTS = ['none', 'newest', 'oldest']
+
+MAX_LIMIT = 50
+
+# filters: AND of groups, each group is an OR of conditions
+OUTPUT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "desc": {"type": "string"},
+        "filters": {
+            "type": "array",
+            "items": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "field": {"type": "string", "enum": FIELDS},
+                        "op": {"type": "string", "enum": OPERATORS},
+                        "value": {"type": "string"}
+                    },
+                    "required": ["field", "op", "value"]
+                }
+            }
+        },
+        "sort": {"type": "string", "enum": SORTS},
+        "limit": {"type": "integer"}
+    },
+    "required": ["desc", "filters", "sort", "limit"]
+}
+
+GENERATION_FIELDS = {
+    'format': OUTPUT_SCHEMA,
+    'options': {'num_predict': NUM_PREDICT}
+}
+
+datePattern = re.compile(r"^(\d{4})(?:-(\d{2})-(\d{2}))?$")
+descPattern = re.compile(r'"desc"\s*:\s*"((?:[^"\\]|\\.)*)"')
+# plain previous query: SELECT * FROM projects WHERE <conditions> [ORDER BY <column> [ASC|DESC]] [LIMIT n]
+wherePattern = re.compile(
+    r"^\s*SELECT\s+\*\s+FROM\s+projects\s+WHERE\s+(.+?)"
+    r"(?:\s+ORDER\s+BY\s+\w+(?:\s+(?:ASC|DESC))?)?(?:\s+LIMIT\s+\d+)?\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL
+)
+literalPattern = re.compile(r"'(?:[^']|'')*'")
+nestedPattern = re.compile(r"\b(SELECT|FROM|JOIN|UNION|GROUP\s+BY|ORDER\s+BY|LIMIT)\b|;", re.IGNORECASE)
+
+# ==================================================
+# compile
+# ==================================================
+
+def cleanValue(value):
+    # wildcards would change the LIKE pattern, quotes are escaped so "Sant'Ana" still matches
+    return escapeLiteral(re.sub(r"[%_\"]", "", str(value or '')).strip())
+
+def compileCondition(condition):
+    """
+    One field/op/value triple to a SQL predicate, or None when it's invalid.
+    """
+    field = condition.get('field')
+    op = condition.get('op')
+    value = cleanValue(condition.get('value'))
+
+    if field not in FIELDS or op not in OPERATORS or not value:
+        return None
+
+    if op == 'contains':
+        return f"{field} LIKE '%{value}%'"
+    if op == 'not_contains':
+        return f"{field} NOT LIKE '%{value}%'"
+
+    # date operators
+    date = datePattern.match(value)
+    if field != 'date' or not date:
+        return None
+
+    year = date.group(1)
+    if op == 'year':
+        return f"date LIKE '%{year}%'"
+    if op == 'before':
+        return f"date < '{value if date.group(2) else f'{year}-01-01'}'"
+    return f"date > '{value if date.group(2) else f'{year}-12-31'}'"
+
+def compileGroup(group):
+    conditions = []
+    for condition in group if isinstance(group, list) else [group]:
+        compiled = compileCondition(condition) if isinstance(condition, dict) else None
+        if compiled and compiled not in conditions:
+            conditions.append(compiled)
+
+    if len(conditions) > 1:
+        return f"({' OR '.join(conditions)})"
+    return conditions[0] if conditions else None
+
+def isSpliceable(where):
+    """
+    Conditions that can be ANDed into a new query as they are: no subqueries or joins,
+    balanced parentheses and string literals.
+    """
+    bare = literalPattern.sub("?", where)
+    if "'" in bare or nestedPattern.search(bare):
+        return False
+
+    depth = 0
+    for char in bare:
+        depth += {'(': 1, ')': -1}.get(char, 0)
+        if depth < 0:
+            return False
+    return depth == 0
+
+def splitConjuncts(where):
+    """
+    Top-level AND operands of a WHERE clause (ANDs inside literals or parentheses are kept).
+    """
+    bare = literalPattern.sub(lambda match: "?" * len(match.group(0)), where)
+    conjuncts = []
+    depth = 0
+    start = 0
+
+    for match in re.finditer(r"\(|\)|\s+AND\s+", bare, re.IGNORECASE):
+        token = match.group(0)
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        elif depth == 0:
+            conjuncts.append(where[start:match.start()].strip())
+            start = match.end()
+
+    conjuncts.append(where[start:].strip())
+    return conjuncts
+
+def previousWhere(previousQueries):
+    """
+    WHERE clause of the previous turn's first query (without ORDER BY / LIMIT), only for
+    plain 'SELECT * FROM projects WHERE ...' queries. None when there's nothing safe to merge into.
+    """
+    for query in previousQueries or []:
+        match = wherePattern.match(query or '')
+        if not match:
+            continue
+
+        where = match.group(1).strip()
+        if not isSpliceable(where):
+            continue
+
+        return f"({where})" if re.search(r"\sOR\s", literalPattern.sub("?", where), re.IGNORECASE) else where
+    return None
+
+def compileOutput(response, action='RESET', previousQueries=None):
+    """
+    Compile the model's JSON answer to "DESC: ...\\nQUERY: ..." text for stripQueries.
+    For MERGE the model only gives the new conditions, they're ANDed onto the previous WHERE.
+    Answers in the old text format are passed through, anything unusable compiles to "".
+    """
+    try:
+        data = json.loads(response)
+    except (TypeError, ValueError):
+        if 'QUERY:' in (response or ''):
+            return response
+        print("DEBUG STRUCTURED: unparseable model output")
+        return ""
+
+    if not isinstance(data, dict):
+        return ""
+
+    # MERGE is only chosen when there's a spliceable previous WHERE (see resolveAction)
+    conditions = []
+    existing = set()
+    if action == 'MERGE':
+        where = previousWhere(previousQueries)
+        if where:
+            conditions.append(where)
+            existing.update(splitConjuncts(where))
+
+    # only exact repeats are dropped, a condition also found inside an OR group still narrows the query
+    for group in data.get('filters') or []:
+        compiled = compileGroup(group)
+        if compiled and compiled not in existing:
+            conditions.append(compiled)
+            existing.add(compiled)
+
+    sort = data.get('sort')
+    if sort not in SORTS:
+        sort = 'none'
+
+    try:
+        limit = int(data.get('limit') or 0)
+    except (TypeError, ValueError):
+        limit = 0
+
+    if not conditions and sort == 'none':
+        print("DEBUG STRUCTURED: model output has no usable filters")
+        return ""
+
+    query = "SELECT * FROM projects"
+    if conditions:
+        query += f" WHERE {' AND '.join(conditions)}"
+    if sort != 'none':
+        query += f" ORDER BY date {'DESC' if sort == 'newest' else 'ASC'}"
+    if limit > 0:
+        query += f" LIMIT {min(limit, MAX_LIMIT)}"
+
+    desc = re.sub(r"\s+", " ", str(data.get('desc') or '')).strip()
+
+    return f"DESC: {desc}\nQUERY: {query};"
+
+def extractDesc(partial):
+    """
+    The desc value from a partially generated JSON answer, once its string is closed.
+    """
+    match = descPattern.search(partial)
+    if not match:
+        return None
+    try:
+        return json.loads(f'"{match.group(1)}"')
+    except ValueError:
+        return match.group(1)
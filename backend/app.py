@@ -3,25 +3,34 @@
 -> main file of the flask app
 '''
 
-from flask import Flask, Response, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 import json
 
-from dataGen.queries import handleQuery
+from dataGen.queries import applyTurn, handleQuery, handleQueryStream, buildQueryFlightKey
 from dataGen.suggestions import getSuggestions
-
-from database.setup import initDatabase
+from dataGen.lexicalParser import getFastPathStats
+from dataGen.intentRouter import getRouterStats
+from dataGen.refinement import getRefinementStats
+
+from database.setup import initDatabase, closeConnections, getResultCacheStats
+from ai.llm.promptCache import getPromptCacheStats
+from ai.llm.client import closeClient
+from ai.llm.sessions import resolveSessionId, getSessionStats
 from database.fetchData import fetchCSV
 from database.models import Project, Interaction
 
 from utilities.scheduler.setup import initScheduler, cleanScheduler
 from utilities.cors.setup import initCors
 from utilities.ratelimit.setup import initRateLimiter, limiter
+from utilities.admission.setup import initAdmission, getAdmissionStats, LLMOverloaded
+from utilities.singleflight.setup import singleFlight, buildFlightKey, getSingleFlightStats
 
 app = Flask(__name__)
 
 initDatabase(app)
 initCors(app)
 initRateLimiter(app)
+initAdmission(app)
 initScheduler(app)
 
 # ==================================================
@@ -47,17 +56,53 @@ def get_random_projects(count):
 
 @app.route('/suggestions/<int:project_id>', methods=['GET'])
 def get_suggestions(project_id):
-    return jsonify(getSuggestions(Project.query.get_or_404(project_id)))
+    # identical concurrent requests share one computation
+    return jsonify(singleFlight(
+        buildFlightKey('suggestions', project_id),
+        lambda: getSuggestions(Project.query.get_or_404(project_id))
+    ))
 
 @app.route('/query', methods=['POST'])
 @limiter.limit("20 per minute")
 def handle_query():
-    return jsonify(handleQuery(request.json))
+    data = request.json
+    data["sessionId"] = resolveSessionId(data.get("sessionId"))
+
+    # coalesced requests share the leader's result, each then applies it to its own session
+    result = dict(singleFlight(buildQueryFlightKey(data), handleQuery, data))
+    applyTurn(data["sessionId"], result.pop("turn", None))
+    return jsonify({**result, "sessionId": data["sessionId"]})
+
+@app.route('/query/stream', methods=['POST'])
+@limiter.limit("20 per minute")
+def handle_query_stream():
+    data = request.json
+
+    # server-sent events: desc / group / fallback / done, errors are sent in-band once streaming started
+    def events():
+        def event(name, payload):
+            return f"event: {name}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        try:
+            for name, payload in handleQueryStream(data):
+                yield event(name, payload)
+        except LLMOverloaded as e:
+            yield event('error', {"error": "Service overloaded", "retryAfter": e.retryAfter})
+        except Exception as e:
+            print(f"DEBUG STREAM: {e}")
+            yield event('error', {"error": "Query failed"})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.route('/fetch-csv')
 @limiter.limit("20 per minute")
 def fetch_csv():
-    return fetchCSV()
+    # ?force=1 skips the conditional GET and the row hashes (full re-diff)
+    return fetchCSV(force=request.args.get('force') == '1')
 
 @app.route('/user-activity', methods=['GET'])
 @limiter.limit("20 per minute")
@@ -66,6 +111,20 @@ def get_user_activity():
     json_str = json.dumps(data, ensure_ascii=False, indent=2)
     return Response(json_str, mimetype='application/json; charset=utf-8')
 
+@app.route('/metrics', methods=['GET'])
+@limiter.limit("20 per minute")
+def get_metrics():
+    return jsonify({
+        "sqlResultCache": getResultCacheStats(),
+        "llmPromptCache": getPromptCacheStats(),
+        "llmAdmission": getAdmissionStats(),
+        "lexicalFastPath": getFastPathStats(),
+        "intentRouter": getRouterStats(),
+        "singleFlight": getSingleFlightStats(),
+        "llmSessions": getSessionStats(),
+        "refinement": getRefinementStats()
+    })
+
 @app.route('/')
 def home():
     return """
@@ -93,4 +152,6 @@ if __name__ == '__main__':
     try:
         app.run(debug=True, use_reloader=False)
     finally:
-        cleanScheduler()
\ No newline at end of file
+        cleanScheduler()
+        closeConnections()
+        closeClient()
\ No newline at end of file
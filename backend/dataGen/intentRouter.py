@@ -0,0 +1,133 @@
+'''
+/dataGen/intentRouter.py
+-> lexical matcher for contextual references ("mesmo autor", "sítio parecido", "outro autor"), the router model only sees ambiguous prompts
+'''
+
+from dotenv import load_dotenv
+import threading
+import os
+import re
+
+from database.search import foldPrompt
+from utilities.cache.setup import LRUCache
+
+load_dotenv()
+
+# ==================================================
+# global vars
+# ==================================================
+
+# patterns from the router system prompt (ai/llm/generateRouterModel.py), matched on folded text
+FIELD_PATTERNS = {
+    'author': r"autor(?:a|es|as)?|artistas?|criador(?:a|es|as)?|obras?",
+    'location': r"sitios?|locais|local|lugar(?:es)?|zonas?|regi(?:ao|oes)|cidades?",
+    'instruments': r"sonoridades?|timbres?|instrumentos?|sons?",
+    'category': r"generos?|estilos?|categorias?|tipos?",
+    'date': r"anos?|epocas?|datas?",
+}
+
+EQUAL_PATTERN = r"parecid[oa]s?|semelhantes?|igua(?:l|is)|mesm[oa]s?|proxim[oa]s?|similar(?:es)?|como (?:este|esta|isto)"
+DIFFERENT_PATTERN = r"diferentes?|distint[oa]s?|nada a ver"
+OTHER_PATTERN = r"outr[oa]s?"
+THIS_PATTERN = r"dest[ea]s?|nest[ea]s?|dist[oa]|nist[oa]|aqui"
+
+# words that carry no search content of their own
+FILLER_WORDS = {
+    'mais', 'mostra', 'mostrar', 'quero', 'ver', 'me', 'mostra-me', 'da-me', 'ha',
+    'videos', 'video', 'projetos', 'projeto', 'trabalhos', 'trabalho', 'coisas', 'coisa',
+    'completamente', 'muito', 'bastante', 'algo', 'tudo', 'com', 'em', 'no', 'na', 'nos', 'nas',
+    'de', 'do', 'da', 'dos', 'das', 'a', 'o', 'as', 'os', 'ao', 'um', 'uma', 'uns', 'umas',
+    'e', 'que', 'este', 'esta', 'isto', 'mas', 'por', 'favor', 'tambem'
+}
+
+def compileWords(pattern):
+    return re.compile(rf"\b(?:{pattern})\b")
+
+fieldMatchers = {field: compileWords(pattern) for field, pattern in FIELD_PATTERNS.items()}
+equalMatcher = compileWords(EQUAL_PATTERN)
+differentMatcher = compileWords(DIFFERENT_PATTERN)
+otherMatcher = compileWords(OTHER_PATTERN)
+thisMatcher = compileWords(THIS_PATTERN)
+
+knownMatcher = compileWords("|".join([*FIELD_PATTERNS.values(), EQUAL_PATTERN, DIFFERENT_PATTERN, OTHER_PATTERN, THIS_PATTERN]))
+
+# router model answers for ambiguous prompts
+ROUTER_CACHE_SIZE = int(os.getenv("ROUTER_CACHE_SIZE", 1024))
+routerCache = LRUCache(ROUTER_CACHE_SIZE)
+
+stats = {"lexical": 0, "ambiguous": 0}
+statsLock = threading.Lock()
+
+# ==================================================
+# methods
+# ==================================================
+
+def count(key):
+    with statsLock:
+        stats[key] += 1
+
+def matchContextualIntent(prompt):
+    """
+    Classify a prompt without the router model.
+    Returns (field, operator), (None, None) when there's no comparison at all,
+    or None when the prompt is ambiguous and the model should decide.
+    """
+    text = foldPrompt(prompt)
+
+    equal = bool(equalMatcher.search(text))
+    different = bool(differentMatcher.search(text))
+    other = bool(otherMatcher.search(text))
+    this = bool(thisMatcher.search(text))
+
+    # "flores", "2011", "projetos em lisboa"
+    if not (equal or different or other or this):
+        count("lexical")
+        return (None, None)
+
+    # leftover content ("parecido com lisboa") or mixed signals go to the model
+    leftover = [w for w in knownMatcher.sub(" ", text).split() if w not in FILLER_WORDS]
+    fields = [field for field, matcher in fieldMatchers.items() if matcher.search(text)]
+
+    # "obras" only points to the author together with "deste"/"outras"
+    if len(fields) > 1 and 'author' in fields and not re.search(r"\bautor|\bartista|\bcriador", text):
+        fields.remove('author')
+
+    if leftover or len(fields) > 1 or (equal and different):
+        count("ambiguous")
+        return None
+
+    field = fields[0] if fields else None
+
+    if equal:
+        operator = 'equal'                   # "mesmo autor", "vídeos parecidos"
+    elif different:
+        operator = 'different'               # "autor diferente", "nada a ver"
+    elif other and this and field:
+        operator = 'equal'                   # "outras obras deste autor", "outros vídeos neste sítio"
+    elif other and field and not this:
+        operator = 'different'               # "outro autor"
+    else:
+        count("ambiguous")
+        return None
+
+    # no field named: "mais como este", "completamente diferentes"
+    count("lexical")
+    return (field or 'category', operator)
+
+def getCachedIntent(prompt):
+    return routerCache.get(foldPrompt(prompt))
+
+def setCachedIntent(prompt, intent):
+    routerCache.set(foldPrompt(prompt), intent)
+
+def getRouterStats():
+    with statsLock:
+        lexical, ambiguous = stats["lexical"], stats["ambiguous"]
+
+    total = lexical + ambiguous
+    return {
+        "lexical": lexical,
+        "ambiguous": ambiguous,
+        "lexicalRate": round(lexical / total, 4) if total else 0.0,
+        "modelCache": routerCache.stats()
+    }
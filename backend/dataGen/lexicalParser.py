@@ -0,0 +1,221 @@
+'''
+/dataGen/lexicalParser.py
+-> rule-based fast path: answer simple prompts (author, place, year, "X em Y") without the LLM
+'''
+
+import threading
+import re
+
+from database.search import foldPrompt, getDataVersion
+from ai.llm.setup import resolveAction
+
+# ==================================================
+# global vars
+# ==================================================
+
+# leading words that don't change what's being searched
+LEAD_INS = [
+    "projetos de", "projetos do", "projetos da", "projetos em",
+    "videos de", "videos do", "videos da", "videos em",
+    "trabalhos de", "trabalhos do", "trabalhos da",
+    "gravado em", "gravados em", "gravado no", "gravado na",
+    "de", "do", "da", "em", "no", "na", "nos", "nas"
+]
+
+# single words shorter than this are too ambiguous to resolve alone
+MIN_WORD_LENGTH = 4
+
+yearPattern = re.compile(r"^(\d{4})$")
+placePattern = re.compile(r"^(.+?)\s+(?:em|no|na|nos|nas)\s+(.+)$")
+boundPattern = re.compile(r"^(.+?)\s+(antes|depois)\s+de\s+(\d{4})$")
+
+vocabulary = None
+vocabularyLock = threading.Lock()
+
+stats = {"prompts": 0, "hits": 0}
+statsLock = threading.Lock()
+
+# ==================================================
+# vocabulary
+# ==================================================
+
+class Vocabulary:
+    """
+    Distinct entity names (authors, categories, instruments, locations) by folded name and by word.
+    """
+
+    def __init__(self, rows, version):
+        # rows: (kind, name, folded)
+        self.version = version
+        self.phrases = {}
+        self.words = {}
+
+        for kind, name, folded in rows:
+            if "'" in name:
+                continue
+
+            self.phrases.setdefault(folded, {})[kind] = name
+
+            for word in folded.split():
+                if len(word) >= MIN_WORD_LENGTH:
+                    self.words.setdefault(word, set()).add(kind)
+
+    def match(self, phrase, kinds=None):
+        """
+        Resolve a folded phrase to a single (kind, value) or None if unknown/ambiguous.
+        """
+        candidates = self.phrases.get(phrase, {})
+        if kinds:
+            candidates = {k: v for k, v in candidates.items() if k in kinds}
+
+        if len(candidates) == 1:
+            return next(iter(candidates.items()))
+
+        if candidates or ' ' in phrase:
+            return None
+
+        wordKinds = self.words.get(phrase, set())
+        if kinds:
+            wordKinds = wordKinds & set(kinds)
+
+        if len(wordKinds) == 1:
+            return (next(iter(wordKinds)), phrase)
+
+        return None
+
+def getVocabulary():
+    """
+    Return the vocabulary, (re)loading it from the entity tables when the data version moved on.
+    """
+    global vocabulary
+    from database.setup import readConnection
+
+    with readConnection() as conn:
+        version = getDataVersion(conn)
+
+        if vocabulary is not None and vocabulary.version == version:
+            return vocabulary
+
+        with vocabularyLock:
+            if vocabulary is None or vocabulary.version != version:
+                rows = conn.execute("SELECT kind, name, folded FROM entities;").fetchall()
+                vocabulary = Vocabulary(rows, version)
+
+    return vocabulary
+
+# ==================================================
+# parsing
+# ==================================================
+
+def stripLeadIn(phrase):
+    for leadIn in LEAD_INS:
+        if phrase.startswith(leadIn + " "):
+            return phrase[len(leadIn) + 1:]
+    return phrase
+
+def describe(kind, value):
+    return {
+        "author": f"Projetos de {value}",
+        "category": f"Projetos do género {value}",
+        "location": f"Gravado em {value}",
+        "instruments": f"Projetos com {value}",
+        "date": f"Publicado em {value}",
+    }[kind]
+
+def condition(kind, value):
+    return f"{kind} LIKE '%{value}%'"
+
+def resolve(phrase, vocab):
+    """
+    Returns (conditions, description) for a prompt or None when not confident.
+    """
+    phrase = stripLeadIn(phrase)
+
+    # "2023"
+    year = yearPattern.match(phrase)
+    if year:
+        return [condition("date", year.group(1))], describe("date", year.group(1))
+
+    # "carlos", "Jorge Cruz", "acordeao"
+    entity = vocab.match(phrase)
+    if entity:
+        return [condition(*entity)], describe(*entity)
+
+    # "fado antes de 2024"
+    bound = boundPattern.match(phrase)
+    if bound:
+        entity = vocab.match(stripLeadIn(bound.group(1)))
+        if entity:
+            year = int(bound.group(3))
+            if bound.group(2) == "antes":
+                dateCondition = f"date < '{year:04d}-01-01'"
+                when = f"antes de {year}"
+            else:
+                dateCondition = f"date > '{year:04d}-12-31'"
+                when = f"depois de {year}"
+            return [condition(*entity), dateCondition], f"{describe(*entity)} {when}"
+
+    # "carlos em lisboa", "danca em 2023"
+    place = placePattern.match(phrase)
+    if place:
+        entity = vocab.match(stripLeadIn(place.group(1)))
+        if not entity:
+            return None
+
+        where = place.group(2)
+        year = yearPattern.match(where)
+        if year:
+            return [condition(*entity), condition("date", year.group(1))], f"{describe(*entity)} em {year.group(1)}"
+
+        location = vocab.match(where, kinds=["location"])
+        if location:
+            return [condition(*entity), condition(*location)], f"{describe(*entity)} em {location[1]}"
+
+    return None
+
+def parsePrompt(currentPrompt, previousQueries):
+    """
+    Try to answer the prompt without the LLM.
+    Returns model-like output ("DESC: ...\\nQUERY: ...") for stripQueries, or None.
+    """
+    with statsLock:
+        stats["prompts"] += 1
+
+    # MERGE turns depend on the previous SQL, leave them to the model
+    if resolveAction(currentPrompt, previousQueries) != 'RESET':
+        return None
+
+    phrase = foldPrompt(currentPrompt)
+    if not phrase:
+        return None
+
+    try:
+        resolved = resolve(phrase, getVocabulary())
+    except Exception as e:
+        print(f"DEBUG FAST PATH: error {e}")
+        return None
+
+    if not resolved:
+        return None
+
+    conditions, description = resolved
+
+    with statsLock:
+        stats["hits"] += 1
+
+    print(f"DEBUG FAST PATH: resolved '{currentPrompt}' without LLM")
+
+    return (
+        f"DESC: {description}\n"
+        f"QUERY: SELECT * FROM projects WHERE {' AND '.join(conditions)};"
+    )
+
+def getFastPathStats():
+    with statsLock:
+        prompts, hits = stats["prompts"], stats["hits"]
+
+    return {
+        "prompts": prompts,
+        "hits": hits,
+        "hitRate": round(hits / prompts, 4) if prompts else 0.0
+    }
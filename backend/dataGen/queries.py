@@ -3,12 +3,34 @@
 -> define all the methods for user prompt handle/process
 '''
 
-from database.setup import db, executeQueriesSQL, recordInteraction
-from database.models import serializeProjectMinimal
-from ai.llm.setup import queryLLM
-from dataGen.queryFallback import applyFallback
-import requests
+from database.setup import db, executeQueriesSQL, recordInteraction, normalizeSQL
+from database.models import MINIMAL_COLUMNS, serializeProjectMinimal
+from database.search import ENTITY_FIELDS, buildOverlapSubquery, escapeLiteral, shuffleTies, splitEntities
+from ai.llm.setup import queryLLMStream, generateOutput, commitOutput
+from ai.llm.promptCache import normalizePrompt
+from ai.llm.sessions import resolveSessionId
+from ai.llm.client import ROUTER_MODEL, generate
+from utilities.admission.setup import LLMBusy, LLMOverloaded
+from dataGen.queryFallback import applyFallback, extractTermsFromQueries, buildMultiTermFallback, hasDuplicateProjects
+from dataGen.lexicalParser import parsePrompt
+from dataGen.intentRouter import matchContextualIntent, getCachedIntent, setCachedIntent
+from dataGen.refinement import refineQueries, rememberResults
+from utilities.singleflight.setup import buildFlightKey
+from concurrent.futures import ThreadPoolExecutor
 import random
+import os
+
+# ==================================================
+# global vars
+# ==================================================
+
+# on project pages, start the SQL model together with the router instead of after it
+SPECULATIVE_ROUTING = os.getenv("SPECULATIVE_ROUTING", "1") == "1"
+
+speculativeExecutor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SPECULATIVE_WORKERS", 8)),
+    thread_name_prefix='speculative-sql'
+)
 
 # ==================================================
 # methods
@@ -17,48 +39,44 @@ import random
 def detectContextualIntent(prompt):
     """
     Use the router model to detect if the user prompt contains contextual references.
+    Only meant for prompts the lexical matcher finds ambiguous, answers are cached.
     Returns tuple: (field, operator) where:
     - field: 'category', 'author', 'location', 'date', or None
     - operator: 'equal', 'different', or None
     """
+    cached = getCachedIntent(prompt)
+    if cached is not None:
+        print(f"DEBUG: Router cache hit: {cached}")
+        return cached
+
     try:
-        response = requests.post(
-            'http://localhost:11434/api/generate',
-            json={
-                'model': 'context-router-lastro',
-                'prompt': prompt,
-                'stream': False,
-                'keep_alive': -1
-            },
-            timeout=30
-        )
-
-        if response.status_code == 200:
-            output = response.json().get('response', '').strip().lower()
-            print(f"DEBUG: Router model output: '{output}'")
-
-            # Parse output format: "field-operator"
-            if '-' in output:
-                parts = output.split('-')
-                if len(parts) == 2:
-                    field, operator = parts
-
-                    # Validate field
-                    if field in ['category', 'author', 'location', 'date', 'instruments']:
-                        # Validate operator
-                        if operator in ['equal', 'different']:
-                            return (field, operator)
-                    elif field == 'none' and operator == 'none':
-                        return (None, None)
-
-            print(f"DEBUG: Router model output invalid format: '{output}'")
-            return (None, None)
+        output = generate(ROUTER_MODEL, prompt).get('response', '').strip().lower()
+        print(f"DEBUG: Router model output: '{output}'")
+
+        # Parse output format: "field-operator"
+        if '-' in output:
+            parts = output.split('-')
+            if len(parts) == 2:
+                field, operator = parts
+
+                # Validate field
+                if field in ['category', 'author', 'location', 'date', 'instruments']:
+                    # Validate operator
+                    if operator in ['equal', 'different']:
+                        setCachedIntent(prompt, (field, operator))
+                        return (field, operator)
+                elif field == 'none' and operator == 'none':
+                    setCachedIntent(prompt, (None, None))
+                    return (None, None)
+
+        print(f"DEBUG: Router model output invalid format: '{output}'")
+        return (None, None)
+    except LLMOverloaded:
+        raise
     except Exception as e:
         print(f"DEBUG: Router model error: {e}")
         return (None, None)
 
-    return (None, None)
-
 def buildContextualQuery(contextType, operator, project):
     """
     Build a SQL query directly based on the context type, operator, and project data.
@@ -75,19 +93,19 @@ def buildContextualQuery(contextType, operator, project):
     if operator == 'equal':
         queries = {
             'category': {
-                'query': f"SELECT * FROM projects WHERE category LIKE '%{project.category}%';",
+                'query': f"SELECT * FROM projects WHERE category LIKE '%{escapeLiteral(project.category)}%';",
                 'description': f"Projetos do género {project.category}",
                 'field': 'category',
                 'value': project.category
             },
             'author': {
-                'query': f"SELECT * FROM projects WHERE author LIKE '%{project.author}%';",
+                'query': f"SELECT * FROM projects WHERE author LIKE '%{escapeLiteral(project.author)}%';",
                 'description': f"Projetos de {project.author}",
                 'field': 'author',
                 'value': project.author
             },
             'location': {
-                'query': f"SELECT * FROM projects WHERE location LIKE '%{project.location}%';",
+                'query': f"SELECT * FROM projects WHERE location LIKE '%{escapeLiteral(project.location)}%';",
                 'description': f"Projetos em {project.location}",
                 'field': 'location',
                 'value': project.location
@@ -99,7 +117,7 @@ def buildContextualQuery(contextType, operator, project):
                 'value': year
             },
             'instruments': {
-                'query': f"SELECT * FROM projects WHERE instruments LIKE '%{project.instruments}%';",
+                'query': f"SELECT * FROM projects WHERE instruments LIKE '%{escapeLiteral(project.instruments)}%';",
                 'description': f"Projetos com {project.instruments}",
                 'field': 'instruments',
                 'value': project.instruments
@@ -108,19 +126,19 @@ def buildContextualQuery(contextType, operator, project):
     else:  # operator == 'different'
         queries = {
             'category': {
-                'query': f"SELECT * FROM projects WHERE category NOT LIKE '%{project.category}%';",
+                'query': f"SELECT * FROM projects WHERE category NOT LIKE '%{escapeLiteral(project.category)}%';",
                 'description': f"Projetos de género diferente de {project.category}",
                 'field': 'category',
                 'value': project.category
             },
             'author': {
-                'query': f"SELECT * FROM projects WHERE author NOT LIKE '%{project.author}%';",
+                'query': f"SELECT * FROM projects WHERE author NOT LIKE '%{escapeLiteral(project.author)}%';",
                 'description': f"Projetos de outros autores (não {project.author})",
                 'field': 'author',
                 'value': project.author
             },
             'location': {
-                'query': f"SELECT * FROM projects WHERE location NOT LIKE '%{project.location}%';",
+                'query': f"SELECT * FROM projects WHERE location NOT LIKE '%{escapeLiteral(project.location)}%';",
                 'description': f"Projetos de outras localizações (não {project.location})",
                 'field': 'location',
                 'value': project.location
@@ -132,14 +150,34 @@ def buildContextualQuery(contextType, operator, project):
                 'value': year
             },
             'instruments': {
-                'query': f"SELECT * FROM projects WHERE instruments NOT LIKE '%{project.instruments}%';",
+                'query': f"SELECT * FROM projects WHERE instruments NOT LIKE '%{escapeLiteral(project.instruments)}%';",
                 'description': f"Projetos com outros instrumentos (não {project.instruments})",
                 'field': 'instruments',
                 'value': project.instruments
             }
         }
 
-    return queries.get(contextType)
+    queryInfo = queries.get(contextType)
+
+    # Comma-list fields: one LIKE per entity, the rows the shared-entity join would give (the rewrite
+    # answers each from the indexes). The same SQL is run, shown and sent back as the next previous query
+    if queryInfo and contextType in ENTITY_FIELDS:
+        entities = splitEntities(getattr(project, contextType, None))
+        if len(entities) > 1:
+            queryInfo['query'] = f"SELECT * FROM projects WHERE {buildEntityCondition(contextType, entities, operator == 'different')};"
+
+    return queryInfo
+
+def buildEntityCondition(field, entities, negate=False):
+    if negate:
+        return "(" + " AND ".join(f"{field} NOT LIKE '%{escapeLiteral(entity)}%'" for entity in entities) + ")"
+    return "(" + " OR ".join(f"{field} LIKE '%{escapeLiteral(entity)}%'" for entity in entities) + ")"
+
+def getOverlapCounts(field, projectId):
+    """
+    Number of <field> entities every project shares with projectId.
+    """
+    return {row['projectId']: row['overlap'] for row in executeQueriesSQL([buildOverlapSubquery(field, projectId)])[0]}
 
 def stripQueries(text):
 
@@ -169,86 +207,231 @@ def stripQueries(text):
         
     return result
 
-# ==================================================
-# main
-# ==================================================
-
-def handleQuery(data):
-    print(data)
+def speculateOutput(currentPrompt, previousQueries, sessionId):
+    """
+    generateOutput() while the router decides, None when no LLM slot is spare (the caller then generates as usual).
+    """
+    try:
+        return generateOutput(currentPrompt, previousQueries, sessionId, speculative=True)
+    except LLMBusy:
+        print("DEBUG: LLM slots busy, skipping speculative SQL generation")
+        return None
 
+def resolveContext(data, fastOutput):
+    """
+    Router step: on project pages, check whether the prompt refers to the current project.
+    Returns (contextType, contextOperator, project, sqlFuture), project is None without context.
+    """
     currentPrompt = data["currentPrompt"]
     currentProjectId = data.get("currentProjectId")
 
-    contextProject = None
-    contextType = None
-    contextOperator = None
+    if not currentProjectId:
+        return None, None, None, None
 
-    # Check if user is on a project page and uses contextual references
-    if currentProjectId:
-        contextType, contextOperator = detectContextualIntent(currentPrompt)
+    sqlFuture = None
 
-    # If contextual intent detected, build query directly in Python (fast path)
-    if contextType and contextOperator:
-        from database.models import Project
-        project = Project.query.get(currentProjectId)
+    # Clear-cut phrases ("mesmo autor", "outro autor", no comparison at all) are matched lexically
+    intent = matchContextualIntent(currentPrompt)
 
-        if project:
-            print(f"DEBUG: Contextual intent '{contextType}-{contextOperator}' detected! Building query directly.")
+    if intent is None:
+        # Speculatively generate SQL while the router decides, only used if no context is found
+        # (the session is only saved once the output is used, see commitOutput)
+        if SPECULATIVE_ROUTING and not fastOutput:
+            sqlFuture = speculativeExecutor.submit(speculateOutput, currentPrompt, data["previousQueries"], data.get("sessionId"))
 
-            contextProject = {
-                "title": project.title,
-                "author": project.author,
-                "id": project.id
-            }
+        try:
+            intent = detectContextualIntent(currentPrompt)
+        except LLMOverloaded:
+            # the request is shed, drop the speculative generation if it hasn't started yet
+            if sqlFuture:
+                sqlFuture.cancel()
+            raise
 
-            # Build SQL query directly without LLM
-            queryInfo = buildContextualQuery(contextType, contextOperator, project)
+    contextType, contextOperator = intent
+    if not (contextType and contextOperator):
+        return None, None, None, sqlFuture
 
-            result = {
-                "queries": [queryInfo['query']],
-                "descriptions": [queryInfo['description']],
-            }
+    from database.models import Project
+    project = Project.query.get(currentProjectId)
+
+    if project:
+        print(f"DEBUG: Contextual intent '{contextType}-{contextOperator}' detected! Building query directly.")
+
+        # Discard the speculative SQL generation (cancelled if it hasn't started yet)
+        if sqlFuture:
+            sqlFuture.cancel()
+            sqlFuture = None
+
+    return contextType, contextOperator, project, sqlFuture
+
+def buildQueryFlightKey(data):
+    """
+    Requests with the same normalized prompt, history and project page produce the same answer.
+    """
+    previousQueries = [normalizeSQL(q) for q in data.get("previousQueries") or []]
+    return buildFlightKey('query', normalizePrompt(data["currentPrompt"]), previousQueries, data.get("currentProjectId"))
+
+def serializeGroup(queryResult, shuffle=True):
+    # Shuffle results before serialization (ranked groups keep their order), minimize payload for explore results
+    if shuffle:
+        random.shuffle(queryResult)
+    return [serializeProjectMinimal(project) for project in queryResult]
+
+def handleContextualQuery(contextType, contextOperator, project):
+    """
+    Build and run the contextual query directly in Python (no SQL model), with fallback.
+    """
+    contextProject = {
+        "title": project.title,
+        "author": project.author,
+        "id": project.id
+    }
+
+    # Build SQL query directly without LLM
+    queryInfo = buildContextualQuery(contextType, contextOperator, project)
+
+    result = {
+        "queries": [queryInfo['query']],
+        "descriptions": [queryInfo['description']],
+    }
+
+    rawResults = executeQueriesSQL([queryInfo['query']], MINIMAL_COLUMNS)
+
+    # "same <entity field>": projects sharing the most entities first
+    ranked = contextOperator == 'equal' and contextType in ENTITY_FIELDS
+
+    # Check if any results were found
+    has_results = any(len(queryResult) > 0 for queryResult in rawResults)
+
+    # Apply fallback system if no results
+    if not has_results:
+        print("DEBUG: No contextual results found - applying fallback system")
+        fallback_result = applyFallback([queryInfo['query']])
+
+        # Update result with fallback data
+        result["queries"] = fallback_result["queries"]
+        result["descriptions"] = fallback_result["descriptions"]
+        rawResults = fallback_result["results"]
+        result["fallback_applied"] = True
+        result["fallback_level"] = fallback_result["fallback_level"]
+        ranked = False
+    else:
+        result["fallback_applied"] = False
+
+    if ranked:
+        overlaps = getOverlapCounts(contextType, project.id)
+        rawResults = [shuffleTies(queryResult, lambda row: overlaps.get(row[0], 0)) for queryResult in rawResults]
 
-            rawResults = executeQueriesSQL(result["queries"])
+    result["results"] = [serializeGroup(queryResult, shuffle=not ranked) for queryResult in rawResults]
+    result["contextProject"] = contextProject
 
-            # Check if any results were found
-            has_results = any(len(queryResult) > 0 for queryResult in rawResults)
+    return result
+
+def buildKeywordExpansion(queries, rawResults):
+    """
+    For narrow searches (1-2 terms, under 10 projects) add a keyword search group.
+    Returns {'query', 'description', 'results'} or None.
+    """
+    # Count total projects and main terms
+    total_projects = sum(len(queryResult) for queryResult in rawResults)
+    extracted = extractTermsFromQueries(queries)
+    main_terms = extracted['terms']
+    date_filter = extracted['dateTerm']
+
+    print(f"DEBUG: Total projects: {total_projects}, Main terms count: {len(main_terms)}")
+
+    # If 2 or fewer main terms and less than 10 total projects, add keyword search
+    if not (len(main_terms) <= 2 and len(main_terms) > 0 and total_projects < 10):
+        return None
+
+    print(f"DEBUG: Checking keyword expansion group for terms: {main_terms}")
+
+    # Build keyword search with OR joining all terms
+    keyword_query_info = buildMultiTermFallback(main_terms, date_filter)
+    keyword_results = executeQueriesSQL([keyword_query_info['query']], MINIMAL_COLUMNS)[0]
+
+    # Only add if we got results from keyword search and they're not duplicates
+    if not keyword_results:
+        return None
+
+    # Check if keyword results are duplicate of existing results
+    existingGroups = [{'results': r} for r in rawResults]
+    if hasDuplicateProjects(keyword_results, existingGroups):
+        print(f"DEBUG: Skipping keyword expansion - duplicate projects ({len(keyword_results)} projects)")
+        return None
+
+    print(f"DEBUG: Adding keyword expansion with {len(keyword_results)} additional projects")
+    return {
+        'query': keyword_query_info['query'],
+        'description': keyword_query_info['description'],
+        'results': keyword_results
+    }
+
+# ==================================================
+# main
+# ==================================================
+
+def applyTurn(sessionId, turn):
+    """
+    Session bookkeeping of a handleQuery() answer (model context, matched ids), applied for the
+    request that computed it and for every request coalesced with it.
+    """
+    if not turn:
+        return
+
+    commitOutput((turn["output"], turn["context"]), sessionId)
+    rememberResults(sessionId, turn["queries"], [[(pid,) for pid in ids] for ids in turn["ids"]])
+
+def handleQuery(data):
+    """
+    Answer a /query request. The session is left alone: the caller passes result["turn"] to applyTurn().
+    """
+    print(data)
 
-            # Apply fallback system if no results
-            if not has_results:
-                print("DEBUG: No contextual results found - applying fallback system")
-                fallback_result = applyFallback(result["queries"])
+    currentPrompt = data["currentPrompt"]
 
-                # Update result with fallback data
-                result["queries"] = fallback_result["queries"]
-                result["descriptions"] = fallback_result["descriptions"]
-                rawResults = fallback_result["results"]
-                result["fallback_applied"] = True
-                result["fallback_level"] = fallback_result["fallback_level"]
-            else:
-                result["fallback_applied"] = False
+    # Follow-ups of the same session reuse the model context of the previous turn
+    data["sessionId"] = resolveSessionId(data.get("sessionId"))
 
-            # Shuffle results before serialization
-            for queryResult in rawResults:
-                random.shuffle(queryResult)
+    # Simple prompts (an author, a place, a year...) are resolved without the SQL model
+    fastOutput = parsePrompt(currentPrompt, data["previousQueries"])
 
-            result["results"] = [
-                [serializeProjectMinimal(p) for p in queryResult]
-                for queryResult in rawResults
-            ]
-            result["contextProject"] = contextProject
+    # Check if user is on a project page and uses contextual references
+    contextType, contextOperator, project, sqlFuture = resolveContext(data, fastOutput)
 
-            return result
+    # If contextual intent detected, build query directly in Python (fast path)
+    if project:
+        result = handleContextualQuery(contextType, contextOperator, project)
+        result["sessionId"] = data["sessionId"]
+        result["turn"] = None
+        return result
 
     # Default path: Use LLM for normal queries
-    print("DEBUG: Using LLM for query generation")
-    modelOutput = queryLLM(currentPrompt, data["previousQueries"])
+    generated = sqlFuture.result() if sqlFuture else None
+    context = None
+
+    if fastOutput:
+        modelOutput = fastOutput
+    else:
+        print("DEBUG: Using LLM for query generation")
+        if not generated:
+            generated = generateOutput(currentPrompt, data["previousQueries"], data["sessionId"])
+        modelOutput, context = generated
     print(modelOutput)
 
     #interactionId = recordInteraction(data,modelOutput)
 
     result = stripQueries(modelOutput)
-    rawResults = executeQueriesSQL(result["queries"])
+
+    # Queries that only narrow the previous turn run over its result ids
+    rawResults = executeQueriesSQL(refineQueries(data["sessionId"], result["queries"]), MINIMAL_COLUMNS)
+
+    result["turn"] = {
+        "output": modelOutput,
+        "context": context,
+        "queries": list(result["queries"]),
+        "ids": [[row[0] for row in rows] for rows in rawResults]
+    }
 
     # Check if any results were found
     has_results = any(len(queryResult) > 0 for queryResult in rawResults)
@@ -268,48 +451,127 @@ def handleQuery(data):
         result["fallback_applied"] = False
 
         # Check if we should add keyword expansion
-        # Count total projects and main terms
-        from dataGen.queryFallback import extractTermsFromQueries, buildMultiTermFallback, hasDuplicateProjects
-
-        total_projects = sum(len(queryResult) for queryResult in rawResults)
-        extracted = extractTermsFromQueries(result["queries"])
-        main_terms = extracted['terms']
-        date_filter = extracted['dateTerm']
-
-        print(f"DEBUG: Total projects: {total_projects}, Main terms count: {len(main_terms)}")
-
-        # If 2 or fewer main terms and less than 10 total projects, add keyword search
-        if len(main_terms) <= 2 and len(main_terms) > 0 and total_projects < 10:
-            print(f"DEBUG: Checking keyword expansion group for terms: {main_terms}")
-
-            # Build keyword search with OR joining all terms
-            keyword_query_info = buildMultiTermFallback(main_terms, date_filter)
-            keyword_results = executeQueriesSQL([keyword_query_info['query']])[0]
-
-            # Only add if we got results from keyword search and they're not duplicates
-            if keyword_results and len(keyword_results) > 0:
-                # Check if keyword results are duplicate of existing results
-                existingGroups = [{'results': r} for r in rawResults]
-                isDuplicate = hasDuplicateProjects(keyword_results, existingGroups)
-
-                if isDuplicate:
-                    print(f"DEBUG: Skipping keyword expansion - duplicate projects ({len(keyword_results)} projects)")
-                else:
-                    print(f"DEBUG: Adding keyword expansion with {len(keyword_results)} additional projects")
-                    result["queries"].append(keyword_query_info['query'])
-                    result["descriptions"].append(keyword_query_info['description'])
-                    rawResults.append(keyword_results)
-
-    # Shuffle results before serialization
-    for queryResult in rawResults:
-        random.shuffle(queryResult)
+        expansion = buildKeywordExpansion(result["queries"], rawResults)
+        if expansion:
+            result["queries"].append(expansion['query'])
+            result["descriptions"].append(expansion['description'])
+            rawResults.append(expansion['results'])
 
-    # Minimize payload for explore results
-    result["results"] = [
-        [serializeProjectMinimal(project) for project in queryResult]
-        for queryResult in rawResults
-    ]
+    result["results"] = [serializeGroup(queryResult) for queryResult in rawResults]
+    result["sessionId"] = data["sessionId"]
 
     #print(result)
 
-    return result
\ No newline at end of file
+    return result
+
+def handleQueryStream(data):
+    """
+    Streaming variant of handleQuery, yields (event, payload) pairs:
+    - desc: a description, as soon as the model writes it
+    - group: one result group, as soon as its SQL has run
+    - fallback: no results, fallback groups follow
+    - done: final flags (fallback_applied, fallback_level, contextProject) and the sessionId
+    Groups carry the same fields as the items of handleQuery's queries/descriptions/results.
+    """
+    print(data)
+
+    currentPrompt = data["currentPrompt"]
+    data["sessionId"] = resolveSessionId(data.get("sessionId"))
+
+    fastOutput = parsePrompt(currentPrompt, data["previousQueries"])
+    contextType, contextOperator, project, sqlFuture = resolveContext(data, fastOutput)
+
+    # Contextual queries need no model, send the finished groups right away
+    if project:
+        result = handleContextualQuery(contextType, contextOperator, project)
+
+        for index, query in enumerate(result["queries"]):
+            yield 'group', {
+                "index": index,
+                "query": query,
+                "description": result["descriptions"][index],
+                "results": result["results"][index]
+            }
+
+        yield 'done', {
+            "fallback_applied": result["fallback_applied"],
+            "fallback_level": result.get("fallback_level"),
+            "contextProject": result["contextProject"],
+            "sessionId": data["sessionId"]
+        }
+        return
+
+    generated = sqlFuture.result() if sqlFuture else None
+
+    if fastOutput:
+        lines = fastOutput.split('\n')
+    elif generated:
+        lines = commitOutput(generated, data["sessionId"]).split('\n')
+    else:
+        print("DEBUG: Streaming LLM query generation")
+        lines = queryLLMStream(currentPrompt, data["previousQueries"], data["sessionId"])
+
+    queries = []
+    descriptions = []
+    rawResults = []
+    description = None
+
+    # Run each query as soon as its line is complete
+    for line in lines:
+        parsed = stripQueries(line)
+
+        if parsed["descriptions"]:
+            description = parsed["descriptions"][0]
+            yield 'desc', {"index": len(queries), "description": description}
+
+        for query in parsed["queries"]:
+            queryResult = executeQueriesSQL(refineQueries(data["sessionId"], [query]), MINIMAL_COLUMNS)[0]
+
+            queries.append(query)
+            descriptions.append(description)
+            rawResults.append(queryResult)
+            description = None
+
+            yield 'group', {
+                "index": len(queries) - 1,
+                "query": query,
+                "description": descriptions[-1],
+                "results": serializeGroup(queryResult)
+            }
+
+    rememberResults(data["sessionId"], queries, rawResults)
+
+    has_results = any(len(queryResult) > 0 for queryResult in rawResults)
+
+    # Fallback groups replace the (empty) model groups
+    if not has_results:
+        print("DEBUG: No results found - applying fallback system")
+        fallback_result = applyFallback(queries)
+
+        yield 'fallback', {"fallback_level": fallback_result["fallback_level"]}
+
+        for index, queryResult in enumerate(fallback_result["results"]):
+            yield 'group', {
+                "index": index,
+                "query": fallback_result["queries"][index],
+                "description": fallback_result["descriptions"][index],
+                "results": serializeGroup(queryResult)
+            }
+
+        yield 'done', {
+            "fallback_applied": True,
+            "fallback_level": fallback_result["fallback_level"],
+            "sessionId": data["sessionId"]
+        }
+        return
+
+    expansion = buildKeywordExpansion(queries, rawResults)
+    if expansion:
+        yield 'group', {
+            "index": len(queries),
+            "query": expansion['query'],
+            "description": expansion['description'],
+            "results": serializeGroup(expansion['results'])
+        }
+
+    yield 'done', {"fallback_applied": False, "sessionId": data["sessionId"]}
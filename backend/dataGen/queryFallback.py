@@ -5,6 +5,8 @@
 
 import re
 
+from database.search import SEARCHABLE_COLUMNS
+
 # ==================================================
 # Constants
 # ==================================================
@@ -12,12 +14,6 @@ import re
 # Columns to exclude from single-term wildcard search
 EXCLUDED_COLUMNS = {'date', 'keywords', 'infoPool', 'id', 'link', 'created_at'}
 
-# All searchable columns in the projects table
-SEARCHABLE_COLUMNS = [
-    'title', 'author', 'category', 'direction', 'sound',
-    'production', 'support', 'assistance', 'research',
-    'location', 'instruments'
-]
 
 # ==================================================
 # Term Extraction Methods
@@ -251,6 +247,34 @@ def buildSplitWordsFallback(term, dateFilter=None, maxWords=5):
         'words': words
     }
 
+def buildCombinedFallbackQuery(term, dateFilter=None, columns=None):
+    """
+    Level 1 + 2 in a single statement: match the term against every column at once
+    and return one match flag per column ('<column>Match'), so rows are fetched once
+    and grouped in memory instead of running one query per column.
+
+    Args:
+        term: The single search term to look for
+        dateFilter: Optional year/date to filter by
+        columns: Columns to flag (default: searchable columns + keywords)
+
+    Returns:
+        str: SQL query string
+    """
+    columns = columns or SEARCHABLE_COLUMNS + ['keywords']
+
+    predicates = [f"{column} LIKE '%{term}%'" for column in columns]
+    flags = ", ".join(f"({predicate}) AS {column}Match" for column, predicate in zip(columns, predicates))
+
+    query = f"SELECT *, {flags} FROM projects WHERE ({' OR '.join(predicates)})"
+
+    if dateFilter:
+        query += f" AND date LIKE '%{dateFilter}%'"
+
+    query += ";"
+
+    return query
+
 def buildRandomFallback():
     """
     Final Fallback: Return 100 random projects.
@@ -273,14 +297,37 @@ def extractProjectIds(results):
     Extract project IDs from a result set.
 
     Args:
-        results: List of project dictionaries
+        results: List of project rows (MINIMAL_COLUMNS tuples, id first)
 
     Returns:
         set: Set of project IDs
     """
     if not results:
         return set()
-    return {project.get('id') for project in results if project.get('id') is not None}
+    return {project[0] for project in results if project[0] is not None}
+
+def groupRowsByColumn(rows, columns):
+    """
+    Split the rows of a combined fallback query into one result list per column.
+
+    Args:
+        rows: Project tuples followed by one match flag per column
+        columns: Flagged columns (same order as the flags)
+
+    Returns:
+        dict: {column: [list of project tuples without the flags]}
+    """
+    flagCount = len(columns)
+    groups = {column: [] for column in columns}
+
+    for row in rows:
+        project = row[:-flagCount]
+
+        for column, flag in zip(columns, row[-flagCount:]):
+            if flag:
+                groups[column].append(project)
+
+    return groups
 
 def hasDuplicateProjects(newResults, existingGroups):
     """
@@ -325,6 +372,7 @@ def applyFallback(originalQueries):
         }
     """
     from database.setup import executeQueriesSQL
+    from database.models import MINIMAL_COLUMNS
 
     # Extract terms from the original queries
     extracted = extractTermsFromQueries(originalQueries)
@@ -342,49 +390,37 @@ def applyFallback(originalQueries):
         print(f"DEBUG FALLBACK: Single term '{term}' - searching all columns")
 
         fallbackQueries = buildSingleTermFallback(term, dateFilter)
+        keywordsQuery = buildKeywordsFallback(term, dateFilter)
+        candidateQueries = fallbackQueries + [keywordsQuery]
 
-        # Execute and collect results
-        allResults = executeQueriesSQL([q['query'] for q in fallbackQueries])
+        # Evaluate every column (and keywords) in one pass, grouped per column
+        columns = [q['column'] for q in candidateQueries]
+        rows = executeQueriesSQL([buildCombinedFallbackQuery(term, dateFilter, columns)], MINIMAL_COLUMNS)[0]
+        groupedResults = groupRowsByColumn(rows, columns)
 
-        # Filter out empty results and keep only groups with results
-        # Also check for duplicate project sets
+        # Keep only groups with results, skipping groups with an already seen project set
         validGroups = []
-        for i, res in enumerate(allResults):
-            if res and len(res) > 0:
-                # Only add if this group doesn't have the same projects as an existing group
-                isDuplicate = hasDuplicateProjects(res, validGroups)
-                if isDuplicate:
-                    print(f"DEBUG FALLBACK: Skipping duplicate group for column '{fallbackQueries[i]['column']}' with {len(res)} projects")
-                else:
-                    print(f"DEBUG FALLBACK: Adding group for column '{fallbackQueries[i]['column']}' with {len(res)} projects")
-                    validGroups.append({
-                        'query': fallbackQueries[i]['query'],
-                        'description': fallbackQueries[i]['description'],
-                        'results': res
-                    })
+        seenIds = set()
+        for candidate in candidateQueries:
+            res = groupedResults[candidate['column']]
+            if not res:
+                continue
+
+            ids = frozenset(extractProjectIds(res))
+            if ids in seenIds:
+                print(f"DEBUG FALLBACK: Skipping duplicate group for column '{candidate['column']}' with {len(res)} projects")
+                continue
+
+            print(f"DEBUG FALLBACK: Adding group for column '{candidate['column']}' with {len(res)} projects")
+            seenIds.add(ids)
+            validGroups.append({
+                'query': candidate['query'],
+                'description': candidate['description'],
+                'results': res
+            })
 
         print(f"DEBUG FALLBACK: Found {len(validGroups)} unique groups with results")
 
-        # Always check keywords fallback, regardless of how many groups we have
-        print(f"DEBUG FALLBACK: Checking keywords fallback (currently have {len(validGroups)} groups)")
-        keywordsQuery = buildKeywordsFallback(term, dateFilter)
-        keywordsResults = executeQueriesSQL([keywordsQuery['query']])[0]
-
-        if keywordsResults and len(keywordsResults) > 0:
-            # Only add if not duplicate
-            isDuplicate = hasDuplicateProjects(keywordsResults, validGroups)
-            if isDuplicate:
-                print(f"DEBUG FALLBACK: Skipping keywords fallback - duplicate projects ({len(keywordsResults)} projects)")
-            else:
-                print(f"DEBUG FALLBACK: Adding keywords fallback with {len(keywordsResults)} projects")
-                validGroups.append({
-                    'query': keywordsQuery['query'],
-                    'description': keywordsQuery['description'],
-                    'results': keywordsResults
-                })
-        else:
-            print(f"DEBUG FALLBACK: Keywords fallback returned no results")
-
         # If still no results, try splitting multi-word terms
         if not validGroups:
             print(f"DEBUG FALLBACK: No results found - trying split words fallback")
@@ -392,7 +428,7 @@ def applyFallback(originalQueries):
 
             if splitWordsQuery:
                 print(f"DEBUG FALLBACK: Split '{term}' into words: {splitWordsQuery['words']}")
-                splitWordsResults = executeQueriesSQL([splitWordsQuery['query']])[0]
+                splitWordsResults = executeQueriesSQL([splitWordsQuery['query']], MINIMAL_COLUMNS)[0]
 
                 if splitWordsResults and len(splitWordsResults) > 0:
                     print(f"DEBUG FALLBACK: Split words fallback found {len(splitWordsResults)} projects")
@@ -410,7 +446,7 @@ def applyFallback(originalQueries):
         if not validGroups:
             print(f"DEBUG FALLBACK: No results found - returning random projects")
             randomQuery = buildRandomFallback()
-            randomResults = executeQueriesSQL([randomQuery['query']])[0]
+            randomResults = executeQueriesSQL([randomQuery['query']], MINIMAL_COLUMNS)[0]
 
             return {
                 'queries': [randomQuery['query']],
@@ -431,7 +467,7 @@ def applyFallback(originalQueries):
         print(f"DEBUG FALLBACK: Multiple terms {terms} - searching keywords with OR")
 
         multiTermQuery = buildMultiTermFallback(terms, dateFilter)
-        multiTermResults = executeQueriesSQL([multiTermQuery['query']])[0]
+        multiTermResults = executeQueriesSQL([multiTermQuery['query']], MINIMAL_COLUMNS)[0]
 
         if multiTermResults and len(multiTermResults) > 0:
             return {
@@ -444,7 +480,7 @@ def applyFallback(originalQueries):
         # No results - go to final fallback
         print(f"DEBUG FALLBACK: No results found - returning random projects")
         randomQuery = buildRandomFallback()
-        randomResults = executeQueriesSQL([randomQuery['query']])[0]
+        randomResults = executeQueriesSQL([randomQuery['query']], MINIMAL_COLUMNS)[0]
 
         return {
             'queries': [randomQuery['query']],
@@ -457,7 +493,7 @@ def applyFallback(originalQueries):
     else:
         print(f"DEBUG FALLBACK: No terms found - returning random projects")
         randomQuery = buildRandomFallback()
-        randomResults = executeQueriesSQL([randomQuery['query']])[0]
+        randomResults = executeQueriesSQL([randomQuery['query']], MINIMAL_COLUMNS)[0]
 
         return {
             'queries': [randomQuery['query']],
@@ -0,0 +1,158 @@
+'''
+/dataGen/refinement.py
+-> incremental refinement: a query that only narrows the previous turn's query is evaluated over that turn's ids
+'''
+
+from dotenv import load_dotenv
+import threading
+import os
+import re
+
+from utilities.cache.setup import LRUCache
+
+load_dotenv()
+
+# ==================================================
+# global vars
+# ==================================================
+
+REFINE_MAX_SESSIONS = int(os.getenv("REFINE_MAX_SESSIONS", 1024))
+REFINE_TTL = int(os.getenv("REFINE_TTL", 30 * 60))
+
+# larger result sets aren't kept, filtering them is no cheaper than the indexed query
+REFINE_MAX_IDS = int(os.getenv("REFINE_MAX_IDS", 5000))
+
+# sessionId -> {'version': dataVersion, 'groups': [(conjuncts, ids), ...]}, per worker
+previousResults = LRUCache(REFINE_MAX_SESSIONS, ttl=REFINE_TTL)
+
+wherePattern = re.compile(r"^\s*SELECT\s+\*\s+FROM\s+projects\s+WHERE\s+(.+?)\s*;?\s*$", re.IGNORECASE | re.DOTALL)
+clausePattern = re.compile(r"\b(ORDER\s+BY|GROUP\s+BY|LIMIT|UNION|BETWEEN)\b", re.IGNORECASE)
+
+stats = {"refined": 0}
+statsLock = threading.Lock()
+
+# ==================================================
+# conjuncts
+# ==================================================
+
+def splitConjuncts(query):
+    """
+    Top-level AND terms of a plain 'SELECT * FROM projects WHERE ...' query.
+    Returns None when narrowing can't be proven (top-level OR, ORDER BY/LIMIT, BETWEEN, ...).
+    """
+    match = wherePattern.match(query or '')
+    if not match:
+        return None
+
+    where = match.group(1)
+    conjuncts = []
+    current = []
+    depth = 0
+    inString = False
+    i = 0
+
+    while i < len(where):
+        char = where[i]
+
+        if char == "'":
+            inString = not inString
+        elif not inString:
+            if char == '(':
+                depth += 1
+            elif char == ')':
+                depth -= 1
+                if depth < 0:
+                    return None
+            elif depth == 0:
+                rest = where[i:]
+                if re.match(r"\s+OR\s", rest, re.IGNORECASE):
+                    return None
+                if clausePattern.match(rest):
+                    return None
+                separator = re.match(r"\s+AND\s+", rest, re.IGNORECASE)
+                if separator:
+                    conjuncts.append(''.join(current))
+                    current = []
+                    i += separator.end()
+                    continue
+
+        current.append(char)
+        i += 1
+
+    if inString or depth != 0:
+        return None
+
+    conjuncts.append(''.join(current))
+
+    return frozenset(re.sub(r"\s+", " ", c).strip() for c in conjuncts)
+
+def getVersion():
+    from database.setup import readConnection
+    from database.search import getDataVersion
+
+    with readConnection() as conn:
+        return getDataVersion(conn)
+
+# ==================================================
+# methods
+# ==================================================
+
+def rememberResults(sessionId, queries, rawResults):
+    """
+    Keep the ids matched by each query of this turn (rows are MINIMAL_COLUMNS tuples, id first).
+    """
+    if not sessionId:
+        return
+
+    groups = []
+    for query, rows in zip(queries, rawResults):
+        conjuncts = splitConjuncts(query)
+        if conjuncts is None or len(rows) > REFINE_MAX_IDS:
+            continue
+        groups.append((conjuncts, tuple(sorted(row[0] for row in rows))))
+
+    if groups:
+        previousResults.set(sessionId, {'version': getVersion(), 'groups': groups})
+
+def refineQuery(query, groups):
+    """
+    If every conjunct of a previous query is also a conjunct of this one, evaluate only the
+    added conjuncts over that query's ids (the shared ones already hold for them).
+    """
+    conjuncts = splitConjuncts(query)
+    if not conjuncts:
+        return query
+
+    # the smallest previous set this query narrows
+    candidates = [(ids, previous) for previous, ids in groups if previous <= conjuncts]
+    if not candidates:
+        return query
+
+    ids, previous = min(candidates, key=lambda candidate: len(candidate[0]))
+    conditions = [f"id IN ({', '.join(str(i) for i in ids)})"] + sorted(conjuncts - previous)
+
+    with statsLock:
+        stats["refined"] += 1
+
+    print(f"DEBUG REFINE: evaluating over {len(ids)} previous results")
+    return f"SELECT * FROM projects WHERE {' AND '.join(conditions)};"
+
+def refineQueries(sessionId, queries):
+    """
+    Executable versions of this turn's queries, narrowed to the previous turn's ids where possible.
+    The original queries are still the ones returned to the client.
+    """
+    session = previousResults.get(sessionId) if sessionId else None
+    if not session:
+        return list(queries)
+
+    # ids from before a data refresh are stale
+    if session['version'] != getVersion():
+        return list(queries)
+
+    return [refineQuery(query, session['groups']) for query in queries]
+
+def getRefinementStats():
+    with statsLock:
+        refined = stats["refined"]
+    return {**previousResults.stats(), "refined": refined}
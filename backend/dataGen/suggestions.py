@@ -4,7 +4,8 @@
 '''
 
 from database.setup import executeQueriesSQL
-from database.models import serializeProjectMinimal
+from database.search import ENTITY_FIELDS, buildOverlapQuery, buildSharedEntityCondition, isOverlapQuery, shuffleTies
+from database.models import MINIMAL_COLUMNS, serializeProjectMinimal
 from dataGen.descriptions import describeDirectSuggestion, describeDisruptiveSuggestion
 import random
 import asyncio
@@ -97,15 +98,25 @@ def hasFieldData(field, project):
         return False
     return True
 
-async def buildQueryAndExecute(field, project):
+def serializeSuggestionProjects(query, results):
+    # Shuffle projects within a suggestion, overlap joins only among projects sharing as many entities
+    if isOverlapQuery(query):
+        results = shuffleTies(results, lambda row: row[-1])
+    else:
+        results = list(results)
+        random.shuffle(results)
+    return [serializeProjectMinimal(p) for p in results]
+
+async def buildQueryAndExecute(field, project, excludeConditions=None):
 
     value = getattr(project, field, None)
 
     if not value:
         return None, None
 
-    # Build exclusion clause to exclude current project
-    exclude_clause = f" AND id != {project.id}"
+    # Build exclusion clause to exclude current project (plus any disruptive exclusions)
+    extraConditions = (excludeConditions or []) + [f"id != {project.id}"]
+    exclude_clause = "".join(f" AND {condition}" for condition in extraConditions)
 
     # Special handling for date field
     if field == "date":
@@ -113,11 +124,20 @@ async def buildQueryAndExecute(field, project):
             year = value.strftime('%Y-%m-%d').split('-')[0]
             query = f"SELECT * FROM projects WHERE date LIKE '{year}-%'{exclude_clause}"
             #print(f"[Query - date year] {query}")
-            results = await asyncio.to_thread(executeQueriesSQL, [query])
+            results = await asyncio.to_thread(executeQueriesSQL, [query], MINIMAL_COLUMNS)
             return query, (results[0] if results else None)
         except:
             return None, None
 
+    # Comma-list fields: indexed join on shared entities, ranked by overlap count
+    if field in ENTITY_FIELDS:
+        query = buildOverlapQuery(field, project.id, extraConditions)
+        #print(f"[Query - entity overlap] {query}")
+        results = await asyncio.to_thread(executeQueriesSQL, [query], MINIMAL_COLUMNS)
+
+        if results and results[0]:
+            return query, results[0]
+
     value_str = str(value)
 
     # Check if value contains ", "
@@ -128,7 +148,7 @@ async def buildQueryAndExecute(field, project):
         where_clause = " OR ".join(conditions)
         query = f"SELECT * FROM projects WHERE ({where_clause}){exclude_clause}"
         #print(f"[Query - comma split] {query}")
-        results = await asyncio.to_thread(executeQueriesSQL, [query])
+        results = await asyncio.to_thread(executeQueriesSQL, [query], MINIMAL_COLUMNS)
         return query, (results[0] if results else None)
     else:
         # Try exact match first
@@ -136,7 +156,7 @@ async def buildQueryAndExecute(field, project):
         #print(f"[Query - exact match] {query_exact}")
 
         # Execute query to check if it returns results
-        results = await asyncio.to_thread(executeQueriesSQL, [query_exact])
+        results = await asyncio.to_thread(executeQueriesSQL, [query_exact], MINIMAL_COLUMNS)
 
         if results and results[0]:  # Has results
             #print(f"[Query - exact match SUCCESS] Found {len(results[0])} results")
@@ -152,7 +172,7 @@ async def buildQueryAndExecute(field, project):
                 where_clause = " OR ".join(conditions)
                 query = f"SELECT * FROM projects WHERE ({where_clause}){exclude_clause}"
                 #print(f"[Query - word split] {query}")
-                results = await asyncio.to_thread(executeQueriesSQL, [query])
+                results = await asyncio.to_thread(executeQueriesSQL, [query], MINIMAL_COLUMNS)
                 return query, (results[0] if results else None)
             else:
                 # Fallback to exact match if no significant words (already executed above)
@@ -217,7 +237,7 @@ async def getDirect(project):
         description = describeDirectSuggestion(query, opt["field"])
         selected.append({
             "description": description,
-            "projects": [serializeProjectMinimal(p) for p in results]
+            "projects": serializeSuggestionProjects(query, results)
         })
 
     return selected
@@ -228,12 +248,6 @@ async def executeDisruptiveQuery(option, project):
     if not hasFieldData(option["matchField"], project):
         return None
 
-    # Build and execute match query for the matchField
-    match_query, match_results = await buildQueryAndExecute(option["matchField"], project)
-
-    if not match_query:
-        return None
-
     # Get the exclude field value
     exclude_value = getattr(project, option["excludeField"], None)
 
@@ -242,37 +256,38 @@ async def executeDisruptiveQuery(option, project):
         if option["excludeField"] == "date":
             try:
                 year = exclude_value.strftime('%Y-%m-%d').split('-')[0]
-                exclude_condition = f" AND date NOT LIKE '{year}-%'"
+                exclude_conditions = [f"date NOT LIKE '{year}-%'"]
             except:
-                exclude_condition = ""
+                exclude_conditions = []
+        elif option["excludeField"] in ENTITY_FIELDS:
+            # Projects sharing none of the current project's entities
+            exclude_conditions = [buildSharedEntityCondition(option["excludeField"], project.id, negate=True)]
         else:
             exclude_value_str = str(exclude_value)
 
             # Handle comma-separated values
             if ", " in exclude_value_str:
                 elements = [elem.strip() for elem in exclude_value_str.split(", ")]
-                not_conditions = [f"{option['excludeField']} NOT LIKE '%{elem}%'" for elem in elements if elem]
-                exclude_condition = " AND " + " AND ".join(not_conditions)
+                exclude_conditions = [f"{option['excludeField']} NOT LIKE '%{elem}%'" for elem in elements if elem]
             else:
                 # Single value
-                exclude_condition = f" AND {option['excludeField']} NOT LIKE '%{exclude_value_str}%'"
-
-        # Combine match query with exclude condition
-        final_query = match_query.replace(" AND id !=", exclude_condition + " AND id !=")
+                exclude_conditions = [f"{option['excludeField']} NOT LIKE '%{exclude_value_str}%'"]
 
-        # Execute the disruptive query
-        results = await asyncio.to_thread(executeQueriesSQL, [final_query])
+        # Build and execute the match query with the exclude conditions
+        final_query, results = await buildQueryAndExecute(option["matchField"], project, exclude_conditions)
 
-        if results and results[0]:
+        if final_query and results:
             # Generate dynamic description
             description = describeDisruptiveSuggestion(option["matchField"], option["excludeField"])
-            return (option, description, results[0])
+            return (option, description, final_query, results)
     else:
-        # No exclude value, use match results (already executed)
-        if match_results:
+        # No exclude value, use plain match results
+        match_query, match_results = await buildQueryAndExecute(option["matchField"], project)
+
+        if match_query and match_results:
             # Use direct description as fallback
             description = describeDirectSuggestion(match_query, option["matchField"])
-            return (option, description, match_results)
+            return (option, description, match_query, match_results)
 
     return None
 
@@ -303,10 +318,10 @@ async def getDisruptive(project):
 
     # Create a unique key for each option based on its field combination
     unique_results = {}
-    for option, description, projects in results_list:
+    for option, description, query, projects in results_list:
         key = (option["matchField"], option["excludeField"])
         if key not in unique_results:
-            unique_results[key] = (option, description, projects)
+            unique_results[key] = (option, description, query, projects)
 
     # Convert back to list
     results_list = list(unique_results.values())
@@ -317,10 +332,10 @@ async def getDisruptive(project):
 
     # Build final suggestions with minimal project data
     selected = []
-    for _, description, projects in selected_items:
+    for _, description, query, projects in selected_items:
         selected.append({
             "description": description,
-            "projects": [serializeProjectMinimal(p) for p in projects]
+            "projects": serializeSuggestionProjects(query, projects)
         })
 
     return selected
@@ -345,11 +360,7 @@ async def _getSuggestionsAsync(project):
     # Combine results
     result = direct + disruptive
 
-    # Shuffle projects within each suggestion
-    for suggestion in result:
-        random.shuffle(suggestion["projects"])
-
-    # Shuffle the suggestions themselves
+    # Shuffle the suggestions themselves (projects within each one are shuffled unless ranked)
     random.shuffle(result)
     #result.sort(key=lambda x: len(x["projects"]), reverse=True)
 
@@ -4,13 +4,23 @@
 '''
 
 from io import StringIO
-import requests, pandas as pd
+import requests, pandas as pd, numpy as np
 from dotenv import load_dotenv
-import os, time
+import os, json, hashlib, threading, tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, func
+from sqlalchemy.dialects.sqlite import insert as sqliteInsert
 
-from database.models import db, Project
+from database.models import db, Project, VideoMetadata, SyncMeta, SheetRow
 from database.reportBuilder import ReportBuilder
-from utilities.vimeo.setup import getVimeoDate
+from database.search import rebuildSearchIndex
+from utilities.vimeo.setup import getVimeoVideos, isFinalResult, VIDEO_NOT_FOUND
+
+try:
+    import fcntl
+except ImportError: # not posix, syncs are only serialized within a worker
+    fcntl = None
 
 load_dotenv()
 
@@ -20,6 +30,20 @@ load_dotenv()
 
 GOOGLE_SHEETS_URL = os.getenv("GOOGLE_SHEETS_URL")
 
+SHEET_TIMEOUT = (5, 60)
+
+# days a video Vimeo reported as not found stays cached before it is looked up again
+VIMEO_NOT_FOUND_TTL = float(os.getenv("VIMEO_NOT_FOUND_TTL", 7))
+
+# part of every row hash, bump it when the normalization changes so all rows get re-diffed
+ROW_HASH_VERSION = '1'
+
+# scheduled jobs and the manual route never sync at the same time: a thread lock within a worker,
+# a flock'ed file across gunicorn workers (each one runs its own scheduler)
+SYNC_LOCK_DIR = os.getenv("SYNC_LOCK_DIR", os.path.join(tempfile.gettempdir(), 'lastro-sync'))
+
+localSyncLock = threading.Lock()
+
 # ==================================================
 # auxiliar methods
 # ==================================================
@@ -55,139 +79,387 @@ def concatStrings(strings):
     
     return ''
 
+# ==================================================
+# bulk normalization
+# ==================================================
+
+def text(value):
+    return value if isinstance(value, str) else ''
+
+def mapDistinct(column, function):
+    """
+    function(cell) for every cell of a column, evaluated once per distinct value
+    (sheet columns repeat a lot: categories, regions, instruments).
+    """
+    codes, uniques = pd.factorize(column)
+
+    # extra last slot for missing cells (code -1), the scalar helpers treat None like NaN
+    values = np.array([function(value) for value in uniques] + [function(None)], dtype=object)
+    return pd.Series(values[codes], index=column.index, dtype=object)
+
+def joinCells(columns):
+    """
+    The text concatStrings builds before normalizing (', ' + every string cell), for every row.
+    """
+    joined = np.full(len(columns[0]), '', dtype=object)
+    for column in columns:
+        joined = joined + mapDistinct(column, lambda value: ", " + value if isinstance(value, str) else '').to_numpy()
+
+    return pd.Series(joined, index=columns[0].index, dtype=object)
+
+def finishConcat(joined):
+    # rest of concatStrings on the joined text
+    return normalizeString(joined.replace('\n', ', ')[2:]) if joined else ''
+
+def normalizeProjects(df):
+    """
+    Sheet rows to the sheet-derived project columns in bulk, column by column
+    (same values as buildProjectFields, which stays the per-row reference).
+    """
+    if df.empty:
+        return pd.DataFrame(columns=PROJECT_FIELDS, index=df.index, dtype=object)
+
+    return pd.DataFrame({
+        'title': mapDistinct(df['Tema'], text),
+        'author': mapDistinct(df['Nome'], text),
+        'link': df['Link'].map(cleanLink),
+        'category': mapDistinct(df['Categorias'], normalizeString),
+
+        'direction': mapDistinct(df['Realizador'], normalizeString),
+        'sound': mapDistinct(df['Som'], normalizeString),
+        'production': mapDistinct(df['Produção'], normalizeString),
+        'support': mapDistinct(df['Apoio'], normalizeString),
+        'assistance': mapDistinct(df['Assistência'], normalizeString),
+        'research': mapDistinct(df['Pesquisa'], normalizeString),
+
+        'location': mapDistinct(joinCells([df['Região'], df['Distrito/Ilha'], df['Concelho'], df['Local']]), finishConcat),
+
+        'instruments': mapDistinct(df['Instrumentos'], normalizeString),
+
+        'keywords': mapDistinct(joinCells([df['Palavras Chave'], df['Conceitos-chave']]), lambda joined: normalizeString(finishConcat(joined))),
+        'infoPool': mapDistinct(joinCells([df['História (textos que acompanham vídeos)'], df['Outras Informações'], df['Biografias']]), finishConcat)
+    }, index=df.index)[PROJECT_FIELDS]
+
 # ==================================================
 # POST and PUT handle
 # ==================================================
 
-def insertProject(pid, p, cleanedLink, lineIndex, reporter):
-    checkpointCommit = False
-    
-    date = getVimeoDate(pid)
-   
-    if date == "RATE_LIMIT_EXCEEDED": 
-        checkpointCommit = True
-        print("Sleeping for 1 minute to prevent blocking.")
-        time.sleep(61)
-        date = getVimeoDate(pid)
-   
-    if isinstance(date, str) and "error" in date:
-        reporter.addError(lineIndex, pid, date)
-        return checkpointCommit
-
-    newProject = Project(
-        id=pid, # use the vimeo id as project row id
-        link=cleanedLink,
-        title= p['Tema'] if isinstance(p['Tema'], str) else '',
-        author=p['Nome'] if isinstance(p['Nome'], str) else '',
-        category=normalizeString(p['Categorias']),
-        date=date,
-
-        direction=normalizeString(p['Realizador']),
-        sound=normalizeString(p['Som']),
-        production = normalizeString(p['Produção']),
-        support = normalizeString(p['Apoio']),
-        assistance = normalizeString(p['Assistência']),
-        research = normalizeString(p['Pesquisa']),
-        
-        location=concatStrings([p['Região'],p['Distrito/Ilha'],p['Concelho'],p['Local']]),
+# sheet-derived fields, in the order changes are reported
+PROJECT_FIELDS = [
+    'title', 'author', 'link', 'category',
+    'direction', 'sound', 'production', 'support', 'assistance', 'research',
+    'location', 'instruments', 'keywords', 'infoPool'
+]
 
-        instruments = normalizeString(p['Instrumentos']),
-        
-        keywords = normalizeString(concatStrings([p['Palavras Chave'],p['Conceitos-chave']])),
-        infoPool = concatStrings([p['História (textos que acompanham vídeos)'],p['Outras Informações'],p['Biografias']])
-    )
+def buildProjectFields(p, cleanedLink):
+    return {
+        'title': p['Tema'] if isinstance(p['Tema'], str) else '',
+        'author': p['Nome'] if isinstance(p['Nome'], str) else '',
+        'link': cleanedLink,
+        'category': normalizeString(p['Categorias']),
+
+        'direction': normalizeString(p['Realizador']),
+        'sound': normalizeString(p['Som']),
+        'production': normalizeString(p['Produção']),
+        'support': normalizeString(p['Apoio']),
+        'assistance': normalizeString(p['Assistência']),
+        'research': normalizeString(p['Pesquisa']),
+
+        'location': concatStrings([p['Região'],p['Distrito/Ilha'],p['Concelho'],p['Local']]),
+
+        'instruments': normalizeString(p['Instrumentos']),
+
+        'keywords': normalizeString(concatStrings([p['Palavras Chave'],p['Conceitos-chave']])),
+        'infoPool': concatStrings([p['História (textos que acompanham vídeos)'],p['Outras Informações'],p['Biografias']])
+    }
+
+def checkDate(pid, dates, lineIndex, reporter):
+    """
+    Prefetched publish date of a video, None (reported) when it couldn't be fetched.
+    """
+    date = dates.get(pid)
+
+    if date is None or isinstance(date, str):
+        reporter.addError(lineIndex, pid, date or "{'error': 'missing date'}")
+        return None
+
+    return date
+
+def insertProject(pid, fields, dates, lineIndex, reporter, pending):
+    date = checkDate(pid, dates, lineIndex, reporter)
 
-    db.session.add(newProject)
+    if date is None:
+        return False
+
+    # use the vimeo id as project row id
+    pending['inserts'].append({'id': pid, **fields, 'date': date})
     reporter.addCreatedProject(lineIndex, pid)
-    
-    if checkpointCommit:
-        db.session.commit()
+    return True
 
-def updateProject(existingProject, p, lineIndex, cleanedLink, reporter):
-    checkpointCommit = False
-    
-    changes = []
-    
-    updates = [
-        ('title', p['Tema'] if isinstance(p['Tema'], str) else ''),
-        ('author', p['Nome'] if isinstance(p['Nome'], str) else ''),
-        ('link', cleanedLink),
-        ('category',normalizeString(p['Categorias'])),
-
-        ('direction', normalizeString(p['Realizador'])),
-        ('sound', normalizeString(p['Som'])),
-        ('production', normalizeString(p['Produção'])),
-        ('support', normalizeString(p['Apoio'])),
-        ('assistance', normalizeString(p['Assistência'])),
-        ('research', normalizeString(p['Pesquisa'])),
-        
-        ('location', concatStrings([p['Região'],p['Distrito/Ilha'],p['Concelho'],p['Local']])),
-        
-        ('instruments', normalizeString(p['Instrumentos'])),
-        
-        ('keywords', normalizeString(concatStrings([p['Palavras Chave'],p['Conceitos-chave']]))),
-        ('infoPool', concatStrings([p['História (textos que acompanham vídeos)'],p['Outras Informações'],p['Biografias']]))
-    ]
+def updateProject(existingProject, fields, dates, lineIndex, reporter, pending):
+    updates = dict(fields)
 
     # avoid unecessary access to Vimeo API
-    if getattr(existingProject, "date") is None:
-        date = getVimeoDate(existingProject.id)
-
-        if date == "RATE_LIMIT_EXCEEDED": 
-            checkpointCommit = True
-            print("Sleeping for 1 minute to prevent blocking.")
-            time.sleep(61)
-            date = getVimeoDate(existingProject.id)
-
-        if isinstance(date, str) and "error" in date:
-            reporter.addError(lineIndex, existingProject.id, date)
-            return checkpointCommit
-        
-        updates.append(("date", date))
-    
-    for field, new_val in updates:
-        #print(field, new_val)
-        if getattr(existingProject, field) != new_val:
-            setattr(existingProject, field, new_val)
-            changes.append(field)
-    
+    if existingProject['date'] is None:
+        date = checkDate(existingProject['id'], dates, lineIndex, reporter)
+
+        if date is None:
+            return False
+
+        updates['date'] = date
+
+    changes = [field for field, newVal in updates.items() if existingProject[field] != newVal]
+
     if changes:
-        reporter.addUpdatedProject(lineIndex, existingProject.id, changes)
+        pending['updates'].append({'id': existingProject['id'], **{field: updates[field] for field in changes}})
+        reporter.addUpdatedProject(lineIndex, existingProject['id'], changes)
     else:
         reporter.addUnchangedLine(lineIndex)
-    
-    if checkpointCommit:
+
+    return True
+
+def loadProjects():
+    """
+    All stored projects in one query, keyed by id.
+    """
+    columns = [Project.id, Project.date] + [getattr(Project, field) for field in PROJECT_FIELDS]
+    return {row.id: row._asdict() for row in db.session.execute(select(*columns))}
+
+def applyChanges(pending):
+    """
+    Write the pending inserts/updates with bulk statements (no per-row ORM objects).
+    """
+    # rows another sync already inserted are left to the next diff
+    if pending['inserts']:
+        db.session.execute(sqliteInsert(Project).on_conflict_do_nothing(index_elements=['id']), pending['inserts'])
+    if pending['updates']:
+        db.session.execute(update(Project), pending['updates'])
+
+    pending['inserts'] = []
+    pending['updates'] = []
+
+def cleanLink(link):
+    cleanedLink = link.replace(' ', '').replace('\n', '') if isinstance(link, str) else link
+    if (isinstance(cleanedLink, str) and 'vimeo.com/' in cleanedLink and cleanedLink[-1].isdigit() == False): 
+        cleanedLink = cleanedLink[:-1]
+    return cleanedLink
+
+def isValidLink(cleanedLink):
+    return isinstance(cleanedLink, str) and 'vimeo.com/' in cleanedLink and cleanedLink[-1].isdigit()
+
+def collectVideoPids(df, knownVideos):
+    """
+    Videos of the sheet without cached Vimeo metadata.
+    """
+    pids = []
+    for link in df['Link']:
+        cleanedLink = cleanLink(link)
+        if not isValidLink(cleanedLink):
+            continue
+
+        pid = int(cleanedLink.split("/")[-1])
+        if pid not in knownVideos:
+            pids.append(pid)
+
+    return list(dict.fromkeys(pids))
+
+def loadVideoDates():
+    """
+    Publish dates of all cached videos, keyed by id. Videos cached as not found map to VIDEO_NOT_FOUND
+    until VIMEO_NOT_FOUND_TTL runs out, then they're left out so the next sync asks Vimeo again.
+    """
+    expiry = datetime.utcnow() - timedelta(days=VIMEO_NOT_FOUND_TTL)
+    dates = {}
+
+    for pid, createdDate, fetchedAt in db.session.execute(select(VideoMetadata.id, VideoMetadata.createdDate, VideoMetadata.fetched_at)):
+        if createdDate is not None:
+            dates[pid] = createdDate
+        elif fetchedAt is not None and fetchedAt > expiry:
+            dates[pid] = VIDEO_NOT_FOUND
+
+    return dates
+
+def saveVideoMetadata(rows):
+    """
+    Upsert fetched metadata (expired not found entries are refreshed in place).
+    """
+    statement = sqliteInsert(VideoMetadata)
+    db.session.execute(
+        statement.on_conflict_do_update(
+            index_elements=['id'],
+            set_={column: statement.excluded[column] for column in ('createdDate', 'duration', 'thumbnails', 'fetched_at')}
+        ),
+        rows
+    )
+
+def fetchVideoDates(df):
+    """
+    Publish dates for every video of the sheet: cached ones from videoMetadata, the rest fetched
+    from Vimeo in batches and cached. Not found videos are cached without a date, other failed
+    lookups map to their error string (not cached, retried next sync).
+    """
+    dates = loadVideoDates()
+    fetched = getVimeoVideos(collectVideoPids(df, dates))
+    now = datetime.utcnow()
+
+    rows = [
+        {**video, 'thumbnails': json.dumps(video['thumbnails']), 'fetched_at': now}
+        if isinstance(video, dict) else
+        {'id': pid, 'createdDate': None, 'duration': None, 'thumbnails': None, 'fetched_at': now}
+        for pid, video in fetched.items() if isFinalResult(video)
+    ]
+    if rows:
+        saveVideoMetadata(rows)
         db.session.commit()
 
+    print(f"DEBUG VIMEO: {len(dates)} cached videos, {len(rows)}/{len(fetched)} fetched")
+
+    for pid, video in fetched.items():
+        dates[pid] = video['createdDate'] if isinstance(video, dict) else video
+
+    return dates
+
+# ==================================================
+# incremental sync
+# ==================================================
+
+def loadSyncMeta():
+    return dict(db.session.execute(select(SyncMeta.key, SyncMeta.value)).all())
+
+def saveSyncMeta(values):
+    rows = [{'key': key, 'value': value} for key, value in values.items() if value is not None]
+    if not rows:
+        return
+
+    statement = sqliteInsert(SyncMeta)
+    db.session.execute(statement.on_conflict_do_update(index_elements=['key'], set_={'value': statement.excluded.value}), rows)
+
+def downloadSheet(meta, force=False):
+    """
+    Conditional GET of the sheet with the validators of the last complete sync.
+    Returns (csv text or None when unchanged, validators of this response).
+    """
+    headers = {}
+    if not force:
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('lastModified'):
+            headers['If-Modified-Since'] = meta['lastModified']
+
+    # fetch CSV data (certificates handle), UTF-8 encoding not to loose chars like 'Ç'
+    response = requests.get(GOOGLE_SHEETS_URL, headers=headers, timeout=SHEET_TIMEOUT)
+    if response.status_code == 304:
+        return None, {}
+
+    response.raise_for_status()
+    response.encoding = 'utf-8'
+
+    validators = {
+        'etag': response.headers.get('ETag'),
+        'lastModified': response.headers.get('Last-Modified'),
+        # exports without validators still come back byte-identical when unchanged
+        'bodyHash': hashlib.sha256(response.content).hexdigest()
+    }
+
+    if not force and validators['bodyHash'] == meta.get('bodyHash'):
+        return None, validators
+
+    return response.text, validators
+
+def hashRows(df):
+    """
+    Content hash of every raw sheet row, in row order.
+    """
+    hashes = pd.util.hash_pandas_object(df.astype(str), index=False)
+    return [f"{ROW_HASH_VERSION}:{value:016x}" for value in hashes]
+
+def loadRowHashes():
+    return dict(db.session.execute(select(SheetRow.id, SheetRow.hash)).all())
+
+def saveRowHashes(hashes):
+    if not hashes:
+        return
+
+    statement = sqliteInsert(SheetRow)
+    db.session.execute(
+        statement.on_conflict_do_update(index_elements=['id'], set_={'hash': statement.excluded.hash}),
+        [{'id': pid, 'hash': rowHash} for pid, rowHash in hashes.items()]
+    )
+
 # ==================================================
 # fetch logic
 # ==================================================
 
-def fetchCSV():
+@contextmanager
+def syncLock():
+    """
+    Held for a whole sync, later callers wait and then usually stop at the conditional GET.
+    """
+    with localSyncLock:
+        if not fcntl:
+            yield
+            return
+
+        os.makedirs(SYNC_LOCK_DIR, exist_ok=True)
+        fd = os.open(os.path.join(SYNC_LOCK_DIR, "sync.lock"), os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+def fetchCSV(force=False):
+    with syncLock():
+        return syncCSV(force)
+
+def syncCSV(force=False):
     reporter = ReportBuilder()
     visitedIds = {}
     duplicateIds = {} 
 
-    # fetch CSV data (certificates handle), UTF-8 encoding not to loose chars like 'Ç'
-    response = requests.get(GOOGLE_SHEETS_URL)
-    response.raise_for_status()
-    response.encoding = 'utf-8'
+    meta = loadSyncMeta()
+    text, validators = downloadSheet(meta, force)
+
+    # nothing changed since the last complete sync: no parsing, no writes, same data version
+    if text is None:
+        if validators:
+            saveSyncMeta(validators)
+            db.session.commit()
+        print("DEBUG SYNC: sheet not modified")
+        return reporter.notModified()
 
-    df = pd.read_csv(StringIO(response.text))
+    df = pd.read_csv(StringIO(text))
 
     reporter.initialize(len(df))
 
-    for lineIndex, p in enumerate(df.iloc, 1):
+    # diff against the stored rows, written in bulk
+    existingProjects = loadProjects()
+    pending = {'inserts': [], 'updates': []}
+
+    # only rows whose content hash changed are normalized and diffed
+    storedHashes = {} if force else loadRowHashes()
+    rowHashes = hashRows(df)
+    changedHashes = {}
+    failed = 0
+
+    # rows not matching any synced row hash are normalized in bulk up front
+    newRows = ~pd.Series(rowHashes, index=df.index).isin(set(storedHashes.values()))
+    normalized = normalizeProjects(df[newRows])
+    normalizedRows = dict(zip(normalized.index, zip(*[normalized[field].tolist() for field in PROJECT_FIELDS])))
+
+    # publish dates come from the metadata cache, unknown videos are fetched up front in batches
+    dates = fetchVideoDates(df)
+
+    for lineIndex, (rowIndex, p, rowHash) in enumerate(zip(df.index, df.iloc, rowHashes), 1):
 
         print(f"{lineIndex}/{len(df)}")
         lineIndex = lineIndex + 1 # csv header compensation
 
-        cleanedLink = p['Link'].replace(' ', '').replace('\n', '') if isinstance(p['Link'], str) else p['Link']
-        if (isinstance(cleanedLink, str) and 'vimeo.com/' in cleanedLink and cleanedLink[-1].isdigit() == False): 
-            cleanedLink = cleanedLink[:-1]
+        cleanedLink = cleanLink(p['Link'])
        
         # check if link exists and is valid
-        if not isinstance(cleanedLink, str) or 'vimeo.com/' not in cleanedLink or not cleanedLink[-1].isdigit(): 
+        if not isValidLink(cleanedLink): 
             if pd.isna(cleanedLink) or str(cleanedLink).lower() == 'nan':
                 reporter.addNanLine(lineIndex)
                 continue
@@ -210,18 +482,48 @@ def fetchCSV():
         
         visitedIds[pid] = lineIndex
 
-        existingProject = Project.query.filter_by(id = pid).first()
+        existingProject = existingProjects.get(pid)
+
+        # same row content as the last sync of this project
+        if existingProject and existingProject['date'] is not None and storedHashes.get(pid) == rowHash:
+            reporter.addUnchangedLine(lineIndex)
+            continue
+
+        fields = dict(zip(PROJECT_FIELDS, normalizedRows[rowIndex])) if rowIndex in normalizedRows else buildProjectFields(p, cleanedLink)
         
         if existingProject:
-            updateProject(existingProject, p, lineIndex, cleanedLink, reporter)
+            synced = updateProject(existingProject, fields, dates, lineIndex, reporter, pending)
         else:
             reporter.flushUnchangedBatch()
-            insertProject(pid, p, cleanedLink, lineIndex, reporter)
+            synced = insertProject(pid, fields, dates, lineIndex, reporter, pending)
+
+        # videos Vimeo doesn't have are reported, but only lookups worth retrying keep the sync incomplete
+        if not synced:
+            if not isFinalResult(dates.get(pid)):
+                failed += 1
+        elif storedHashes.get(pid) != rowHash:
+            changedHashes[pid] = rowHash
+
+    written = len(pending['inserts']) + len(pending['updates'])
         
+    applyChanges(pending)
+    saveRowHashes(changedHashes)
+
     reporter.flushNanBatch()
     reporter.addDuplicateSummary(duplicateIds)
-    reporter.addDatabaseSummary(len(Project.query.all()))
+    reporter.addDatabaseSummary(db.session.scalar(select(func.count()).select_from(Project)))
 
     db.session.commit()
 
-    return reporter.finalize()
\ No newline at end of file
+    # keep the full-text index in sync with the committed rows (the data version only moves when projects did)
+    if written:
+        rebuildSearchIndex()
+
+    # rows that failed transiently must be retried, so an incomplete sync never short-circuits the next one
+    if not failed:
+        saveSyncMeta(validators)
+        db.session.commit()
+
+    print(f"DEBUG SYNC: {written} projects written, {len(changedHashes)} row hashes updated, {failed} failed")
+
+    return reporter.finalize()
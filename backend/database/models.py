@@ -5,22 +5,29 @@
 
 from sqlalchemy import Date
 from datetime import datetime
+import json
 from database.setup import db
 
 # ==================================================
 # Utility functions
 # ==================================================
 
-def serializeProjectMinimal(project_dict):
+# columns selected for suggestions and search results (raw SQL rows come back as tuples in this order)
+MINIMAL_COLUMNS = ['id', 'title', 'author', 'category']
+
+def serializeProjectMinimal(project):
     """
-    Convert raw SQL project dict to minimal serialized format.
+    Convert a raw SQL project row (MINIMAL_COLUMNS tuple or dict) to minimal serialized format.
     Only returns essential fields needed for display in suggestions and search results.
     """
+    if isinstance(project, dict):
+        return {column: project.get(column) for column in MINIMAL_COLUMNS}
+
     return {
-        "id": project_dict.get("id"),
-        "title": project_dict.get("title"),
-        "author": project_dict.get("author"),
-        "category": project_dict.get("category")
+        "id": project[0],
+        "title": project[1],
+        "author": project[2],
+        "category": project[3]
     }
 
 # -----------------------------
@@ -36,7 +43,7 @@ class Project(db.Model):
     title = db.Column(db.String(128))
     author = db.Column(db.String(128))
     category = db.Column(db.String(256))
-    date = db.Column(Date)
+    date = db.Column(Date, index=True)
 
     # technical info
     direction = db.Column(db.String(256))
@@ -58,6 +65,15 @@ class Project(db.Model):
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # cached Vimeo metadata (project id is the vimeo id), joined to avoid a query per project
+    video = db.relationship(
+        'VideoMetadata',
+        primaryjoin='Project.id == foreign(VideoMetadata.id)',
+        uselist=False,
+        viewonly=True,
+        lazy='joined'
+    )
+
     def serialize(self):
         return {
             "id": self.id,
@@ -81,12 +97,135 @@ class Project(db.Model):
             "keywords": self.keywords,
             "infoPool": self.infoPool,
 
+            "duration": self.video.duration if self.video else None,
+            "thumbnails": self.video.getThumbnails() if self.video else [],
+
             "created_at": self.created_at.isoformat() if self.created_at else None
         }
 
     def __repr__(self):
         return f'<Project {self.id}>'
+
+# -----------------------------
+# VideoMetadata model
+# -----------------------------
+
+class VideoMetadata(db.Model):
+    # Vimeo metadata cache keyed by video id (filled on CSV fetch, known videos are never re-requested,
+    # videos Vimeo reported as not found are kept without a date until VIMEO_NOT_FOUND_TTL runs out)
+    __tablename__ = 'videoMetadata'
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    createdDate = db.Column(Date)
+    duration = db.Column(db.Integer) # seconds
+    thumbnails = db.Column(db.Text) # json list of {width, height, link}
+
+    fetched_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def getThumbnails(self):
+        try:
+            return json.loads(self.thumbnails) if self.thumbnails else []
+        except ValueError:
+            return []
+
+    def serialize(self):
+        return {
+            "id": self.id,
+
+            "createdDate": self.createdDate.isoformat() if self.createdDate else None,
+            "duration": self.duration,
+            "thumbnails": self.getThumbnails(),
+
+            "fetched_at": self.fetched_at.isoformat() if self.fetched_at else None
+        }
+
+    def __repr__(self):
+        return f'<VideoMetadata {self.id}>'
     
+# -----------------------------
+# ProjectSearch model
+# -----------------------------
+
+class ProjectSearch(db.Model):
+    # accent- and case-folded copy of the searchable project columns (filled on CSV fetch)
+    __tablename__ = 'projectsSearch'
+
+    id = db.Column(db.Integer, db.ForeignKey('projects.id'), primary_key=True)
+
+    title = db.Column(db.String(128))
+    author = db.Column(db.String(128), index=True)
+    category = db.Column(db.String(256), index=True)
+
+    direction = db.Column(db.String(256))
+    sound = db.Column(db.String(256))
+    production = db.Column(db.String(256))
+    support = db.Column(db.String(256))
+    assistance = db.Column(db.String(256))
+    research = db.Column(db.String(256))
+
+    location = db.Column(db.String(512), index=True)
+
+    instruments = db.Column(db.String(256), index=True)
+
+    keywords = db.Column(db.String(1024))
+    infoPool = db.Column(db.String(2048))
+
+    def __repr__(self):
+        return f'<ProjectSearch {self.id}>'
+
+# -----------------------------
+# Entity models
+# -----------------------------
+
+class Entity(db.Model):
+    # distinct values of the comma-list fields (author, category, location, instruments)
+    __tablename__ = 'entities'
+    __table_args__ = (db.UniqueConstraint('kind', 'folded'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    kind = db.Column(db.String(32), nullable=False)
+    name = db.Column(db.String(256), nullable=False)
+    folded = db.Column(db.String(256), nullable=False)
+
+    def __repr__(self):
+        return f'<Entity {self.kind}:{self.name}>'
+
+class ProjectEntity(db.Model):
+    # project <-> entity links
+    __tablename__ = 'projectEntities'
+
+    projectId = db.Column(db.Integer, db.ForeignKey('projects.id'), primary_key=True)
+    entityId = db.Column(db.Integer, db.ForeignKey('entities.id'), primary_key=True, index=True)
+
+    def __repr__(self):
+        return f'<ProjectEntity {self.projectId}-{self.entityId}>'
+
+# -----------------------------
+# Sheet sync models
+# -----------------------------
+
+class SyncMeta(db.Model):
+    # key/value state of the CSV sync (ETag, Last-Modified, body hash of the last complete sync)
+    __tablename__ = 'syncMeta'
+
+    key = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.String(512))
+
+    def __repr__(self):
+        return f'<SyncMeta {self.key}>'
+
+class SheetRow(db.Model):
+    # content hash of the sheet row each project was last synced from
+    __tablename__ = 'sheetRows'
+
+    id = db.Column(db.Integer, db.ForeignKey('projects.id'), primary_key=True)
+    hash = db.Column(db.String(64), nullable=False)
+
+    def __repr__(self):
+        return f'<SheetRow {self.id}>'
+
 # -----------------------------
 # Interaction model
 # -----------------------------
@@ -154,6 +154,11 @@ class ReportBuilder:
         self.unchangedStart = self.unchangedEnd = None
         self.nanStart = self.nanEnd = None
     
+    def notModified(self):
+        self.report = self.getStyles()
+        self.report += "<h1>CSV sem alterações desde a última sincronização.</h1>"
+        return self.report
+
     def flushUnchangedBatch(self):
         if self.unchangedStart is not None:
             if self.unchangedStart == self.unchangedEnd:
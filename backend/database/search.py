@@ -0,0 +1,475 @@
+'''
+/database/search.py
+-> folded search columns, full-text search index and rewrite of LIKE lookups into indexed matches
+'''
+
+import sqlite3
+import random
+import os
+import re
+import unicodedata
+
+from database.trigramIndex import MAX_INLINE_IDS, buildTrigramIndex, getTrigramIndex
+
+# ==================================================
+# global vars
+# ==================================================
+
+SEARCH_TABLE = 'projectsSearch'
+SEARCH_INDEX = 'projectsFts'
+
+# key/value table holding the data version (bumped every time the search data is refilled)
+META_TABLE = 'searchMeta'
+
+# columns copied (accent- and case-folded) into the search table
+FOLDED_COLUMNS = [
+    'title', 'author', 'category', 'direction', 'sound',
+    'production', 'support', 'assistance', 'research',
+    'location', 'instruments', 'keywords', 'infoPool'
+]
+
+# All searchable columns in the projects table (fallback searches, in-process trigram index)
+SEARCHABLE_COLUMNS = [
+    'title', 'author', 'category', 'direction', 'sound',
+    'production', 'support', 'assistance', 'research',
+    'location', 'instruments'
+]
+
+# folded columns covered by the full-text index
+INDEXED_COLUMNS = [
+    'title', 'author', 'category', 'location',
+    'instruments', 'keywords', 'infoPool'
+]
+
+# free text: its common trigrams repeat in nearly every row, so phrase-matching a common term
+# costs more than the folded LIKE scan (scripts/benchSearch.py)
+SCANNED_COLUMNS = ['infoPool']
+
+# comma-list fields normalized into entities / projectEntities
+ENTITY_FIELDS = ['author', 'category', 'location', 'instruments']
+
+# alias of the overlap subquery in buildOverlapQuery
+OVERLAP_ALIAS = 'overlaps'
+
+# share of the catalogue above which a term is answered by the folded LIKE scan: past it, reading
+# the id list or the posting lists costs more than reading every row (scripts/benchSearch.py)
+SCAN_FRACTION = float(os.getenv("SEARCH_SCAN_FRACTION", 0.5))
+
+# share of the catalogue up to which a literal id list beats the FTS index and the scan (capped by MAX_INLINE_IDS)
+INLINE_FRACTION = float(os.getenv("SEARCH_INLINE_FRACTION", 0.25))
+
+# trigram tokenizer matches substrings, so '%term%' keeps its LIKE semantics
+# (terms shorter than a trigram cannot be answered by the index)
+MIN_TERM_LENGTH = 3
+
+SEARCH_INDEX_SQL = (
+    f"CREATE VIRTUAL TABLE {SEARCH_INDEX} USING fts5("
+    f"{', '.join(INDEXED_COLUMNS)}, "
+    f"content='{SEARCH_TABLE}', content_rowid='id', tokenize='trigram')"
+)
+
+# col LIKE '%term%' / col NOT LIKE '%term%', optionally table-qualified (quotes in the term doubled)
+likePattern = re.compile(r"\b((?:\w+\.)?)(\w+)\s+(NOT\s+)?LIKE\s+'%((?:[^%']|'')+)%'", re.IGNORECASE)
+
+# leading SELECT * / SELECT projects.*
+starPattern = re.compile(r"^\s*SELECT\s+(\w+\.)?\*", re.IGNORECASE)
+
+# date [NOT] LIKE '%2023%' / '2023-%' / '%2023-05%' (optionally table-qualified)
+datePattern = re.compile(r"\b((?:\w+\.)?)date\s+(NOT\s+)?LIKE\s+'%?(\d{4})(?:-(\d{2}))?-?%'", re.IGNORECASE)
+
+# WHERE id IN (1, 2, 3) AND ... : query already restricted to a literal id list
+candidatePattern = re.compile(r"^\s*SELECT\b[^()]*?\bWHERE\s+id\s+IN\s+\(([\d,\s]+)\)\s+AND\b", re.IGNORECASE | re.DOTALL)
+
+searchIndexReady = False
+
+# ==================================================
+# folding
+# ==================================================
+
+def foldString(string):
+    """
+    Strip diacritics and lower-case, so "Dança" and "danca" compare equal.
+    """
+    if not isinstance(string, str):
+        return ''
+
+    decomposed = unicodedata.normalize('NFKD', string)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+def foldPrompt(prompt):
+    """
+    foldString of a user prompt with punctuation dropped and whitespace collapsed (lexical matching and router cache keys).
+    """
+    prompt = re.sub(r"[^\w\s-]", " ", foldString(prompt or ''))
+    return re.sub(r"\s+", " ", prompt).strip()
+
+def escapeLiteral(string):
+    # value inside a single-quoted sql literal
+    return str(string).replace("'", "''")
+
+# ==================================================
+# index setup
+# ==================================================
+
+def createSearchIndex(conn):
+    """
+    Create (or upgrade) the FTS5 index and fill the search data when it's missing.
+    Returns True if the index is usable on this sqlite build.
+    """
+    global searchIndexReady
+
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {META_TABLE} (key VARCHAR(64) PRIMARY KEY, value INTEGER NOT NULL);")
+
+    current = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?;",
+        (SEARCH_INDEX,)
+    ).fetchone()
+
+    try:
+        if current and current[0] != SEARCH_INDEX_SQL:
+            conn.execute(f"DROP TABLE {SEARCH_INDEX};")
+            current = None
+
+        if not current:
+            conn.execute(SEARCH_INDEX_SQL + ";")
+
+        searchIndexReady = True
+    except Exception as e:
+        print(f"DEBUG SEARCH: FTS5 index unavailable, using folded LIKE scans ({e})")
+        searchIndexReady = False
+
+    upgradeSearchSchema(conn)
+
+    projectCount = conn.execute("SELECT COUNT(*) FROM projects;").fetchone()[0]
+    searchCount = conn.execute(f"SELECT COUNT(*) FROM {SEARCH_TABLE};").fetchone()[0]
+
+    entityCount = conn.execute("SELECT COUNT(*) FROM projectEntities;").fetchone()[0]
+
+    if not current or projectCount != searchCount or (projectCount and not entityCount):
+        fillSearchData(conn)
+
+    conn.commit()
+    return searchIndexReady
+
+def upgradeSearchSchema(conn):
+    """
+    Add the indexes introduced after a database was first created, and drop the unused search year.
+    Year filters are range scans on the indexed projects.date (see buildDateRangePredicate).
+    """
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_projects_date ON projects (date);")
+
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({SEARCH_TABLE});")}
+    if 'year' not in columns:
+        return
+
+    conn.execute(f"DROP INDEX IF EXISTS ix_{SEARCH_TABLE}_year;")
+    try:
+        conn.execute(f"ALTER TABLE {SEARCH_TABLE} DROP COLUMN year;")
+    except sqlite3.OperationalError as e:
+        # sqlite < 3.35, the nullable column is just left unfilled
+        print(f"DEBUG SEARCH: couldn't drop {SEARCH_TABLE}.year ({e})")
+
+def fillSearchData(conn):
+    """
+    Rebuild the folded search table from projects and re-sync the index.
+    Runs inside the caller's transaction.
+    """
+    columns = ', '.join(FOLDED_COLUMNS)
+    rows = conn.execute(f"SELECT id, {columns} FROM projects;").fetchall()
+
+    conn.execute(f"DELETE FROM {SEARCH_TABLE};")
+    conn.executemany(
+        f"INSERT INTO {SEARCH_TABLE} (id, {columns}) VALUES ({', '.join('?' * (len(FOLDED_COLUMNS) + 1))});",
+        [(row[0], *[foldString(value) for value in row[1:]]) for row in rows]
+    )
+
+    if searchIndexReady:
+        conn.execute(f"INSERT INTO {SEARCH_INDEX}({SEARCH_INDEX}) VALUES('rebuild');")
+
+    fillEntities(conn, rows)
+
+    bumpDataVersion(conn)
+
+def getDataVersion(conn):
+    row = conn.execute(f"SELECT value FROM {META_TABLE} WHERE key = 'dataVersion';").fetchone()
+    return row[0] if row else 0
+
+def bumpDataVersion(conn):
+    # invalidates result caches and in-process indexes in every worker
+    conn.execute(
+        f"INSERT INTO {META_TABLE} (key, value) VALUES ('dataVersion', 1) "
+        "ON CONFLICT(key) DO UPDATE SET value = value + 1;"
+    )
+
+def splitEntities(value):
+    if not isinstance(value, str):
+        return []
+    return [part.strip() for part in value.split(', ') if part.strip()]
+
+def fillEntities(conn, rows):
+    """
+    Rebuild the entity and link tables from (id, *FOLDED_COLUMNS, ...) project rows.
+    """
+    positions = {field: FOLDED_COLUMNS.index(field) + 1 for field in ENTITY_FIELDS}
+
+    entityIds = {}
+    entities = []
+    links = set()
+
+    for row in rows:
+        for field, position in positions.items():
+            for name in splitEntities(row[position]):
+                key = (field, foldString(name))
+
+                if key not in entityIds:
+                    entityIds[key] = len(entities) + 1
+                    entities.append((entityIds[key], field, name, key[1]))
+
+                links.add((row[0], entityIds[key]))
+
+    conn.execute("DELETE FROM projectEntities;")
+    conn.execute("DELETE FROM entities;")
+    conn.executemany("INSERT INTO entities (id, kind, name, folded) VALUES (?, ?, ?, ?);", entities)
+    conn.executemany("INSERT INTO projectEntities (projectId, entityId) VALUES (?, ?);", sorted(links))
+
+def rebuildSearchIndex():
+    """
+    Re-sync the folded columns and the indexes with the projects table (called after each CSV fetch).
+    """
+    from database.setup import getConnection
+
+    conn = getConnection()
+    try:
+        fillSearchData(conn)
+        conn.commit()
+
+        buildTrigramIndex(conn)
+    finally:
+        conn.close()
+
+# ==================================================
+# entity joins
+# ==================================================
+
+def buildOverlapSubquery(field, projectId):
+    """
+    Projects sharing at least one <field> entity with projectId, with the number shared.
+    """
+    return (
+        "SELECT link.projectId, COUNT(*) AS overlap FROM projectEntities own "
+        "JOIN entities ON entities.id = own.entityId "
+        "JOIN projectEntities link ON link.entityId = own.entityId "
+        f"WHERE own.projectId = {int(projectId)} AND entities.kind = '{field}' "
+        "GROUP BY link.projectId"
+    )
+
+def buildOverlapQuery(field, projectId, conditions=None):
+    """
+    Indexed join replacing the per-element LIKE chains: projects sharing <field>
+    entities with projectId, most shared first. conditions are ANDed to the WHERE.
+    The overlap count is selected last, for shuffleTies.
+    """
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    return (
+        f"SELECT projects.*, {OVERLAP_ALIAS}.overlap FROM projects "
+        f"JOIN ({buildOverlapSubquery(field, projectId)}) {OVERLAP_ALIAS} ON {OVERLAP_ALIAS}.projectId = projects.id"
+        f"{where} ORDER BY {OVERLAP_ALIAS}.overlap DESC;"
+    )
+
+def shuffleTies(rows, rank):
+    """
+    Highest rank first, random order among equal ranks (most projects share exactly one entity).
+    """
+    rows = list(rows)
+    random.shuffle(rows)
+    rows.sort(key=rank, reverse=True)
+    return rows
+
+def isOverlapQuery(sql):
+    # results of overlap joins are ranked, callers keep their order instead of shuffling
+    return f") {OVERLAP_ALIAS} ON " in (sql or '')
+
+def buildSharedEntityCondition(field, projectId, negate=False):
+    """
+    Predicate for projects that do (or, negated, don't) share a <field> entity with projectId.
+    """
+    operator = "NOT IN" if negate else "IN"
+
+    return (
+        f"id {operator} (SELECT link.projectId FROM projectEntities own "
+        "JOIN entities ON entities.id = own.entityId "
+        "JOIN projectEntities link ON link.entityId = own.entityId "
+        f"WHERE own.projectId = {int(projectId)} AND entities.kind = '{field}')"
+    )
+
+# ==================================================
+# query rewrite
+# ==================================================
+
+def projectQuery(sql, columns):
+    """
+    Replace a leading SELECT * with only the given columns.
+    Returns (sql, projected) where projected says whether the rewrite applied.
+    """
+    def replace(match):
+        qualifier = match.group(1) or ''
+        return "SELECT " + ", ".join(f"{qualifier}{column}" for column in columns)
+
+    sql, count = starPattern.subn(replace, sql, count=1)
+    return sql, count == 1
+
+def scanPredicate(column, folded, negate=False, qualifier=''):
+    """
+    The LIKE path on the folded column. Short fields are matched in one pass over the search table,
+    long text row by row, so the query's other filters narrow the rows first.
+    """
+    literal = escapeLiteral(folded)
+
+    if column in SEARCHABLE_COLUMNS:
+        operator = "NOT IN" if negate else "IN"
+        return f"{qualifier}id {operator} (SELECT id FROM {SEARCH_TABLE} WHERE {column} LIKE '%{literal}%')"
+
+    operator = "NOT LIKE" if negate else "LIKE"
+    return f"(SELECT {column} FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE}.id = {qualifier or 'projects.'}id) {operator} '%{literal}%'"
+
+def idListPredicate(ids, negate=False, qualifier=''):
+    operator = "NOT IN" if negate else "IN"
+    return f"{qualifier}id {operator} ({', '.join(str(pid) for pid in sorted(ids))})"
+
+def ftsPredicate(column, folded, negate=False, qualifier=''):
+    operator = "NOT IN" if negate else "IN"
+    phrase = escapeLiteral(folded.replace('"', '""'))
+    return f"{qualifier}id {operator} (SELECT rowid FROM {SEARCH_INDEX} WHERE {SEARCH_INDEX} MATCH '{column}:\"{phrase}\"')"
+
+def isFtsUsable(column, folded):
+    return searchIndexReady and column in INDEXED_COLUMNS and len(folded) >= MIN_TERM_LENGTH
+
+def probeIndex(column, folded, limit, conn=None):
+    """
+    Ids of at most limit + 1 rows matching the term in the FTS index, the exact matches when it finds no more than limit.
+    """
+    sql = f"SELECT rowid FROM {SEARCH_INDEX} WHERE {SEARCH_INDEX} MATCH ? LIMIT {int(limit) + 1};"
+    phrase = f'{column}:"' + folded.replace('"', '""') + '"'
+
+    if conn is not None:
+        return {row[0] for row in conn.execute(sql, (phrase,))}
+
+    from database.setup import readConnection
+
+    with readConnection() as ownConn:
+        return {row[0] for row in ownConn.execute(sql, (phrase,))}
+
+def buildMatchPredicate(column, term, negate=False, dataVersion=None, candidates=None, conn=None, qualifier=''):
+    """
+    Build an accent-insensitive predicate equivalent to column [NOT] LIKE '%term%'.
+    With candidates (a literal id list the query is restricted to), only those rows are checked.
+    Otherwise the match count picks the plan: an inline id list, the FTS index, or the folded
+    LIKE scan where the index loses (more than SCAN_FRACTION of the catalogue, common terms in SCANNED_COLUMNS).
+    """
+    predicate = buildPlanPredicate(column, foldString(term), negate, dataVersion, candidates, conn, qualifier)
+
+    # NOT LIKE is never true on NULL, but NOT IN and the folded '' are: keep those rows out
+    if negate:
+        return f"({qualifier}{column} IS NOT NULL AND {predicate})"
+    return predicate
+
+def buildPlanPredicate(column, folded, negate, dataVersion, candidates, conn, qualifier):
+
+    # few candidate rows: scanning them beats any index lookup
+    if candidates:
+        operator = "NOT IN" if negate else "IN"
+        return (
+            f"{qualifier}id {operator} (SELECT id FROM {SEARCH_TABLE} "
+            f"WHERE id IN ({candidates}) AND {column} LIKE '%{escapeLiteral(folded)}%')"
+        )
+
+    index = getTrigramIndex(dataVersion, conn)
+    scanLimit = SCAN_FRACTION * index.size
+    inlineLimit = min(MAX_INLINE_IDS, INLINE_FRACTION * index.size)
+
+    # short fields: exact matches from the in-process trigram index
+    if column in SEARCHABLE_COLUMNS:
+        ids = index.lookup(column, folded)
+
+        if len(ids) <= inlineLimit:
+            return idListPredicate(ids, negate, qualifier)
+        if len(ids) <= scanLimit and isFtsUsable(column, folded):
+            return ftsPredicate(column, folded, negate, qualifier)
+
+    # long fields: inline the FTS matches of a rare term, a common one goes through the index or the scan
+    elif isFtsUsable(column, folded):
+        ids = probeIndex(column, folded, inlineLimit, conn)
+
+        if len(ids) <= inlineLimit:
+            return idListPredicate(ids, negate, qualifier)
+        if column not in SCANNED_COLUMNS:
+            return ftsPredicate(column, folded, negate, qualifier)
+
+    return scanPredicate(column, folded, negate, qualifier)
+
+def buildDateRangePredicate(qualifier, year, month=None, negate=False):
+    """
+    Build a range predicate on the indexed date column equivalent to a year(-month) LIKE.
+    """
+    year = int(year)
+
+    if month:
+        month = int(month)
+        start = f"{year:04d}-{month:02d}-01"
+        end = f"{year + month // 12:04d}-{month % 12 + 1:02d}-01"
+    else:
+        start = f"{year:04d}-01-01"
+        end = f"{year + 1:04d}-01-01"
+
+    column = f"{qualifier}date"
+
+    if negate:
+        return f"({column} < '{start}' OR {column} >= '{end}')"
+    return f"({column} >= '{start}' AND {column} < '{end}')"
+
+def hasTopLevelOr(sql):
+    """
+    Whether an OR outside quotes and parentheses could widen the query past a leading conjunct.
+    """
+    depth = 0
+    inString = False
+
+    for i, char in enumerate(sql):
+        if char == "'":
+            inString = not inString
+        elif not inString:
+            if char == '(':
+                depth += 1
+            elif char == ')':
+                depth -= 1
+            elif depth <= 0 and re.match(r"\sOR\s", sql[i:i + 4], re.IGNORECASE):
+                return True
+
+    return False
+
+def rewriteQuery(sql, dataVersion=None, conn=None):
+    """
+    Turn year(-month) LIKE predicates on date into range scans, and every
+    col [NOT] LIKE '%term%' predicate on a folded column into a lookup on the
+    search table / index. Anything else is left untouched.
+    """
+    restricted = candidatePattern.match(sql)
+    candidates = None
+    if restricted and restricted.group(1).count(',') < MAX_INLINE_IDS and not hasTopLevelOr(sql[restricted.end():]):
+        candidates = restricted.group(1).strip()
+
+    sql = datePattern.sub(
+        lambda match: buildDateRangePredicate(match.group(1), match.group(3), match.group(4), match.group(2) is not None),
+        sql
+    )
+
+    def replace(match):
+        qualifier, column, negate, term = match.group(1), match.group(2), match.group(3), match.group(4)
+
+        if column not in FOLDED_COLUMNS:
+            return match.group(0)
+
+        return buildMatchPredicate(column, term.replace("''", "'"), negate is not None, dataVersion, candidates, conn, qualifier)
+
+    return likePattern.sub(replace, sql)
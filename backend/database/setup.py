@@ -5,8 +5,15 @@
 
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.pool import QueuePool
+from database.search import createSearchIndex, getDataVersion, projectQuery, rewriteQuery
+from utilities.cache.setup import LRUCache
+from contextlib import contextmanager
+import threading
 import sqlite3
+import atexit
+import queue
 import os
+import re
 
 # ==================================================
 # global vars
@@ -17,6 +24,25 @@ db = SQLAlchemy()
 dbName = 'lastro.db'
 dbPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), dbName)
 
+# raw sql reader connections kept open per worker (executeQueriesSQL, search indexes)
+SQL_POOL_SIZE = int(os.getenv("SQL_POOL_SIZE", 8))
+
+# seconds to wait for a free reader connection before giving up
+SQL_POOL_TIMEOUT = float(os.getenv("SQL_POOL_TIMEOUT", 10))
+
+# results of raw sql queries, keyed by normalized sql and invalidated by the data version
+SQL_CACHE_SIZE = int(os.getenv("SQL_CACHE_SIZE", 512))
+
+resultCache = LRUCache(SQL_CACHE_SIZE)
+resultCacheVersion = None
+
+CONNECTION_PRAGMAS = [
+    "PRAGMA busy_timeout = 5000;",
+    "PRAGMA mmap_size = 268435456;",  # 256MB
+    "PRAGMA cache_size = -16000;",    # 16MB
+    "PRAGMA temp_store = MEMORY;",
+]
+
 # ==================================================
 # initialize and config on app context
 # ==================================================
@@ -43,38 +69,194 @@ def initDatabase(app):
         db.init_app(app)
 
         with app.app_context():
-            db.create_all()
-
             from database.models import Project
-            from database.fetchData import fetchCSV
-            
-            if Project.query.count() == 0:
-                fetchCSV()
+            from database.fetchData import syncCSV, syncLock
+
+            # every gunicorn worker boots through here: one at a time under the sync lock, so only
+            # the first one creates the tables, (re)builds the search index or runs the initial fetch
+            with syncLock():
+                db.create_all()
+
+                conn = getConnection()
+                try:
+                    # WAL is persistent, readers then never block on the nightly fetch
+                    conn.execute("PRAGMA journal_mode = WAL;")
+                    createSearchIndex(conn)
+                finally:
+                    conn.close()
+
+                if Project.query.count() == 0:
+                    syncCSV()
 
 # ==================================================
 # other methods
 # ==================================================
 
+# -----------------------------
+# connections
+# -----------------------------
+
 def getConnection():
-    conn = sqlite3.connect(dbPath)
-    conn.row_factory = sqlite3.Row
+    # read/write connection, caller closes it
+    conn = sqlite3.connect(dbPath, timeout=5)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
     return conn
 
-def executeQueriesSQL(queries):
-    conn = getConnection()
-    results = []
-    
+class ConnectionPool:
+    """
+    Bounded pool of read-only connections shared by every raw sql reader.
+    Connections are opened lazily and reused across threads and requests.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+
+    def open(self):
+        conn = sqlite3.connect(dbPath, timeout=5, check_same_thread=False)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        conn.execute("PRAGMA query_only = ON;")
+        return conn
+
+    def acquire(self):
+        # never reuse connections inherited from a parent process (gunicorn fork)
+        if self.pid != os.getpid():
+            self.reset()
+
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self.lock:
+            if self.created < self.size:
+                self.created += 1
+                try:
+                    return self.open()
+                except Exception:
+                    self.created -= 1
+                    raise
+
+        try:
+            return self.idle.get(timeout=SQL_POOL_TIMEOUT)
+        except queue.Empty:
+            raise TimeoutError(f"no sql connection free after {SQL_POOL_TIMEOUT}s (pool size {self.size})")
+
+    def release(self, conn):
+        self.idle.put(conn)
+
+    def reset(self):
+        with self.lock:
+            self.idle = queue.LifoQueue()
+            self.created = 0
+            self.pid = os.getpid()
+
+    def drain(self):
+        # only idle connections are closed, checked out ones still count against the size until released
+        with self.lock:
+            while True:
+                try:
+                    self.idle.get_nowait().close()
+                except queue.Empty:
+                    break
+                self.created -= 1
+
+connectionPool = ConnectionPool(SQL_POOL_SIZE)
+
+@contextmanager
+def readConnection():
+    conn = connectionPool.acquire()
     try:
+        yield conn
+    finally:
+        connectionPool.release(conn)
+
+def closeConnections():
+    connectionPool.drain()
+
+atexit.register(closeConnections)
+
+# -----------------------------
+# queries
+# -----------------------------
+
+def normalizeSQL(sql):
+    return re.sub(r'\s+', ' ', sql).strip().rstrip(';').strip()
+
+def isCacheable(sql):
+    # random samples must stay random
+    return 'random(' not in sql.lower()
+
+def syncResultCache(version):
+    global resultCacheVersion
+
+    if version != resultCacheVersion:
+        resultCache.clear()
+        resultCacheVersion = version
+
+def runQuery(c, sql, columns, dataVersion):
+    # the trigram index is (re)built on this cursor's connection, never on a second pooled one
+    sql = rewriteQuery(sql, dataVersion, c.connection)
+
+    if not columns:
+        c.execute(sql)
+        names = [desc[0] for desc in c.description]
+        return [dict(zip(names, row)) for row in c.fetchall()]
+
+    sql, projected = projectQuery(sql, columns)
+    c.execute(sql)
+
+    if projected:
+        return c.fetchall()
+
+    # custom select list: pick the requested columns by name
+    names = [desc[0] for desc in c.description]
+    positions = [names.index(column) if column in names else None for column in columns]
+    return [tuple(row[p] if p is not None else None for p in positions) for row in c.fetchall()]
+
+def executeQueriesSQL(queries, columns=None):
+    """
+    Run each query and return one row list per query.
+    Without columns rows are dicts of every selected column. With columns the
+    projection is pushed into the query and rows are tuples in that order
+    (followed by any extra selected expressions).
+    Results are served from the result cache while the data version is unchanged.
+    """
+    results = []
+
+    with readConnection() as conn:
+        dataVersion = getDataVersion(conn)
+        syncResultCache(dataVersion)
+
         c = conn.cursor()
 
-        for sql in queries:
-            c.execute(sql.strip())
-            columns = [desc[0] for desc in c.description]
-            rows = [dict(zip(columns, row)) for row in c.fetchall()]
-            results.append(rows)
-        return results
-    finally:
-        conn.close()
+        try:
+            for sql in queries:
+                sql = normalizeSQL(sql)
+                key = (sql, tuple(columns) if columns else None, dataVersion)
+                cacheable = isCacheable(sql)
+
+                rows = resultCache.get(key) if cacheable else None
+
+                if rows is None:
+                    rows = tuple(runQuery(c, sql, columns, dataVersion))
+                    if cacheable:
+                        resultCache.set(key, rows)
+
+                # callers shuffle result lists in place
+                results.append(list(rows))
+        finally:
+            c.close()
+
+    return results
+
+def getResultCacheStats():
+    return {**resultCache.stats(), "dataVersion": resultCacheVersion}
 
 def recordInteraction(data,result):
     if data["cookieConsent"]:
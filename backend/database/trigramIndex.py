@@ -0,0 +1,118 @@
+'''
+/database/trigramIndex.py
+-> in-process trigram index for infix lookups on the searchable columns
+'''
+
+import threading
+
+# ==================================================
+# global vars
+# ==================================================
+
+# cap on a literal id list, whatever the catalogue size (the query text grows with it)
+MAX_INLINE_IDS = 5000
+
+trigramIndex = None
+buildLock = threading.Lock()
+
+# ==================================================
+# index
+# ==================================================
+
+def trigramsOf(string):
+    return {string[i:i + 3] for i in range(len(string) - 2)}
+
+class TrigramIndex:
+    """
+    Posting lists (trigram -> project ids) per column, built from the folded search table.
+    """
+
+    def __init__(self, rows, columns, version=0):
+        # rows: (id, *folded values in columns order)
+        self.version = version
+        self.size = len(rows)
+        self.values = {column: {} for column in columns}
+        self.postings = {column: {} for column in columns}
+
+        for row in rows:
+            pid = row[0]
+            for column, value in zip(columns, row[1:]):
+                if not value:
+                    continue
+
+                self.values[column][pid] = value
+                columnPostings = self.postings[column]
+                for gram in trigramsOf(value):
+                    columnPostings.setdefault(gram, set()).add(pid)
+
+    def lookup(self, column, term):
+        """
+        Return the ids whose folded column value contains the (folded) term.
+        """
+        values = self.values[column]
+
+        if len(term) < 3:
+            return {pid for pid, value in values.items() if term in value}
+
+        postings = self.postings[column]
+        lists = []
+        for gram in trigramsOf(term):
+            ids = postings.get(gram)
+            if not ids:
+                return set()
+            lists.append(ids)
+
+        # intersect smallest posting lists first
+        lists.sort(key=len)
+        candidates = set(lists[0])
+        for ids in lists[1:]:
+            candidates &= ids
+            if not candidates:
+                return candidates
+
+        # trigrams can match out of order, confirm the actual substring
+        return {pid for pid in candidates if term in values[pid]}
+
+# ==================================================
+# build and access
+# ==================================================
+
+def buildTrigramIndex(conn):
+    """
+    (Re)build the process-wide index from the folded search table.
+    """
+    global trigramIndex
+    from database.search import SEARCH_TABLE, SEARCHABLE_COLUMNS, getDataVersion
+
+    version = getDataVersion(conn)
+    rows = conn.execute(
+        f"SELECT id, {', '.join(SEARCHABLE_COLUMNS)} FROM {SEARCH_TABLE};"
+    ).fetchall()
+
+    trigramIndex = TrigramIndex(rows, SEARCHABLE_COLUMNS, version)
+    return trigramIndex
+
+def isCurrent(index, version):
+    return index is not None and (version is None or index.version == version)
+
+def getTrigramIndex(version=None, conn=None):
+    """
+    Return the index, (re)building it on first use in this process or when
+    the data version moved on (e.g. another worker fetched the CSV).
+    Callers already holding a pooled connection pass it as conn: taking a second
+    one from the bounded pool could wait forever on a busy worker.
+    """
+    if isCurrent(trigramIndex, version):
+        return trigramIndex
+
+    with buildLock:
+        if not isCurrent(trigramIndex, version):
+            if conn is not None:
+                buildTrigramIndex(conn)
+            else:
+                from database.setup import readConnection
+
+                with readConnection() as ownConn:
+                    buildTrigramIndex(ownConn)
+
+    return trigramIndex
@@ -0,0 +1,78 @@
+'''
+/scripts/benchPool.py
+-> raw sql calls/sec with a fresh connection per call (before the pool) vs the bounded connection pool, 1 and 8 threads (python scripts/benchPool.py [rows])
+'''
+
+import os
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database.setup as setup
+from scripts.benchSearch import buildDatabase
+
+# ==================================================
+# global vars
+# ==================================================
+
+THREADS = [1, 8]
+
+# seconds each variant runs for
+DURATION = 3
+
+SQL = "SELECT * FROM projects WHERE id = ?;"
+
+# ==================================================
+# calls
+# ==================================================
+
+def freshCall(pid):
+    # what executeQueriesSQL did before the pool: connect, query, close
+    conn = sqlite3.connect(setup.dbPath)
+    try:
+        return conn.execute(SQL, (pid,)).fetchall()
+    finally:
+        conn.close()
+
+def pooledCall(pid):
+    with setup.readConnection() as conn:
+        return conn.execute(SQL, (pid,)).fetchall()
+
+def callsPerSecond(call, threads, rows):
+    counts = [0] * threads
+    deadline = time.perf_counter() + DURATION
+
+    def run(slot):
+        rng = random.Random(slot)
+        while time.perf_counter() < deadline:
+            call(rng.randint(1, rows))
+            counts[slot] += 1
+
+    workers = [threading.Thread(target=run, args=(slot,)) for slot in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    return sum(counts) / DURATION
+
+# ==================================================
+# main
+# ==================================================
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    buildDatabase(os.path.join(tempfile.mkdtemp(), 'pool.db'), rows)
+
+    for threads in THREADS:
+        before = callsPerSecond(freshCall, threads, rows)
+        after = callsPerSecond(pooledCall, threads, rows)
+        print(f"{threads} thread(s): {before:8.0f} -> {after:8.0f} calls/s ({after / before:.1f}x, pool size {setup.SQL_POOL_SIZE})")
+
+    setup.connectionPool.drain()
+    assert setup.connectionPool.created == 0, "every idle connection closed"
@@ -0,0 +1,194 @@
+'''
+/scripts/benchSearch.py
+-> LIKE scans vs the rewritten (FTS5 / trigram / entity) queries, and per-predicate latency of every plan, on synthetic catalogues of 1x, 10x and 100x today's size (python scripts/benchSearch.py [todayRows])
+'''
+
+import os
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+import database.setup as setup
+import database.trigramIndex as trigramIndex
+from database.search import SEARCHABLE_COLUMNS, buildMatchPredicate, createSearchIndex, foldString, ftsPredicate, idListPredicate, isFtsUsable, probeIndex, rewriteQuery, scanPredicate
+
+# ==================================================
+# global vars
+# ==================================================
+
+NAMES = ['Carlos Silva', 'Jorge Cruz', 'Filipe Sambado', 'Ana Moura', 'João Pires', 'Maria Açores', 'Rita Dança', 'Tiago Sá']
+CATEGORIES = ['Música', 'Dança', 'Tradição Oral', 'Poesia', 'Religião', 'Paisagens Sonoras', 'Gastronomia', 'Artesanato']
+LOCATIONS = ['Lisboa', 'Porto', 'Açores, São Miguel', 'Madeira', 'Braga', 'Évora', 'Coimbra', 'Faro']
+INSTRUMENTS = ['guitarra portuguesa', 'viola braguesa', 'adufe', 'acordeão', 'bombo', 'cavaquinho', 'gaita de foles']
+WORDS = 'fado tradição canto festa aldeia rio mar serra amor trabalho pão vinho romaria igreja'.split()
+
+# accented terms as the model writes them (the rewrite folds accents, plain LIKE only ASCII case)
+QUERIES = [
+    "SELECT * FROM projects WHERE author LIKE '%carlos%';",
+    "SELECT * FROM projects WHERE author LIKE '%pires%' AND category LIKE '%dança%';",
+    "SELECT * FROM projects WHERE location LIKE '%açores%' AND instruments NOT LIKE '%adufe%';",
+    "SELECT * FROM projects WHERE title LIKE '%romaria%' OR keywords LIKE '%vinho%';",
+    "SELECT * FROM projects WHERE infoPool LIKE '%trabalho%' AND date LIKE '%2023%';",
+    "SELECT * FROM projects WHERE date LIKE '%2021-05%';",
+    "SELECT * FROM projects WHERE author LIKE '%moura%' AND location NOT LIKE '%lisboa%';",
+]
+
+# single predicates from rare to matching nearly every row, on short (trigram) and long (FTS) columns
+PREDICATES = [
+    ('author', 'ana moura, joão pires'),
+    ('author', 'moura'),
+    ('title', 'fado rio'),
+    ('title', 'romaria'),
+    ('location', 'açores'),
+    ('location', 'a, '),
+    ('instruments', 'viola'),
+    ('keywords', 'pão, vinho'),
+    ('keywords', 'vinho'),
+    ('infoPool', 'pão vinho romaria'),
+    ('infoPool', 'trabalho'),
+]
+
+RUNS = 5
+
+# catalogue sizes swept, as multiples of today's
+SCALES = [1, 10, 100]
+
+# ==================================================
+# data
+# ==================================================
+
+def buildDatabase(path, rows, seed=1):
+    """
+    Synthetic catalogue of <rows> projects on the app's schema, with the search tables filled.
+    """
+    setup.dbPath = path
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    setup.db.init_app(app)
+
+    with app.app_context():
+        import database.models
+        setup.db.create_all()
+
+    rng = random.Random(seed)
+    conn = setup.getConnection()
+    conn.executemany(
+        "INSERT INTO projects (id, link, title, author, category, date, location, instruments, keywords, infoPool) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);",
+        [(
+            i,
+            f'https://vimeo.com/{i}',
+            ' '.join(rng.sample(WORDS, 3)),
+            ', '.join(rng.sample(NAMES, rng.randint(1, 2))),
+            ', '.join(rng.sample(CATEGORIES, 2)),
+            f'{rng.randint(2010, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+            ', '.join(rng.sample(LOCATIONS, 2)),
+            ', '.join(rng.sample(INSTRUMENTS, 2)),
+            ', '.join(rng.sample(WORDS, 6)),
+            ' '.join(rng.choices(WORDS, k=200))
+        ) for i in range(1, rows + 1)]
+    )
+    conn.commit()
+
+    conn.execute("PRAGMA journal_mode = WAL;")
+    createSearchIndex(conn)
+    conn.close()
+
+    return app
+
+def timeQuery(conn, sql):
+    best = None
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        ids = {row[0] for row in conn.execute(sql)}
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return ids, best
+
+# ==================================================
+# bench
+# ==================================================
+
+def benchQueries(rows):
+    buildDatabase(os.path.join(tempfile.mkdtemp(), f'bench{rows}.db'), rows)
+    conn = sqlite3.connect(setup.dbPath)
+
+    # the in-process trigram index is built on the first rewrite
+    trigramIndex.trigramIndex = None
+    start = time.perf_counter()
+    rewriteQuery(QUERIES[0], conn=conn)
+    print(f"\n{rows} projects, trigram index built in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    for sql in QUERIES:
+        expected, scanTime = timeQuery(conn, sql)
+
+        start = time.perf_counter()
+        rewritten = rewriteQuery(sql, conn=conn)
+        rewriteTime = time.perf_counter() - start
+
+        ids, indexedTime = timeQuery(conn, rewritten)
+
+        assert ids == expected, (sql, len(ids ^ expected))
+        print(f"{len(ids):6d} ids  scan {scanTime * 1000:7.1f}ms  rewritten {indexedTime * 1000:7.1f}ms (+{rewriteTime * 1000:.1f}ms rewrite)  {sql}")
+
+    benchPredicates(conn, rows)
+    conn.close()
+
+def planOf(predicate):
+    if predicate.startswith('(SELECT') or 'SELECT id FROM' in predicate:
+        return 'scan'
+    return 'fts' if 'MATCH' in predicate else 'ids'
+
+def benchPredicates(conn, rows):
+    """
+    Latency of each plan for a single predicate (plain LIKE, folded scan, inline ids, FTS) and the one rewriteQuery picks.
+    """
+    print(f"\n{'predicate':32s} {'hits':>7s}  {'like':>7s} {'scan':>7s} {'ids':>7s} {'fts':>7s} {'routed':>7s}")
+
+    for column, term in PREDICATES:
+        folded = foldString(term)
+        expected, likeTime = timeQuery(conn, f"SELECT * FROM projects WHERE {column} LIKE '%{term}%';")
+
+        # ids: the lookup (trigram index or unbounded FTS probe) is part of the plan
+        start = time.perf_counter()
+        if column in SEARCHABLE_COLUMNS:
+            ids = trigramIndex.trigramIndex.lookup(column, folded)
+        else:
+            ids = probeIndex(column, folded, rows, conn)
+        lookupTime = time.perf_counter() - start
+
+        plans = {
+            'scan': scanPredicate(column, folded),
+            'ids': idListPredicate(ids),
+            'fts': ftsPredicate(column, folded) if isFtsUsable(column, folded) else None,
+            'routed': buildMatchPredicate(column, term, conn=conn)
+        }
+
+        times = {}
+        for name, predicate in plans.items():
+            if predicate is None:
+                continue
+
+            found, times[name] = timeQuery(conn, f"SELECT * FROM projects WHERE {predicate};")
+            assert found == expected, (column, term, name, len(found ^ expected))
+
+        times['ids'] += lookupTime
+
+        cells = ' '.join(f"{times[name] * 1000:7.1f}" if name in times else f"{'-':>7s}" for name in ('scan', 'ids', 'fts', 'routed'))
+        print(f"{column + ' ' + repr(term):32s} {len(expected) / rows:6.1%}  {likeTime * 1000:7.1f} {cells}  -> {planOf(plans['routed'])}")
+
+# ==================================================
+# main
+# ==================================================
+
+if __name__ == '__main__':
+    today = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+    for scale in SCALES:
+        benchQueries(today * scale)
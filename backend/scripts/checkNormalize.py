@@ -0,0 +1,136 @@
+'''
+/scripts/checkNormalize.py
+-> property check of the bulk sheet normalization against the per-row one (python scripts/checkNormalize.py [seed] [--bench])
+'''
+
+import os
+import sys
+import time
+import random
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.fetchData import PROJECT_FIELDS, buildProjectFields, cleanLink, normalizeProjects
+
+# ==================================================
+# global vars
+# ==================================================
+
+SHEET_COLUMNS = [
+    'Link', 'Tema', 'Nome', 'Categorias', 'Realizador', 'Som', 'Produção', 'Apoio', 'Assistência', 'Pesquisa',
+    'Região', 'Distrito/Ilha', 'Concelho', 'Local', 'Instrumentos', 'Palavras Chave', 'Conceitos-chave',
+    'História (textos que acompanham vídeos)', 'Outras Informações', 'Biografias'
+]
+
+# delimiters, whitespace variants and accents the normalization has to treat exactly like the per-row code
+TOKENS = [
+    'a', 'Ana', 'Rui', 'e', ' e ', ' & ', '&', ',', ', ', '\n', ' ', '  ', '\t', '\xa0',
+    'Ç', 'ção', 'e\n', ' e', 'e ', ',,', ' ,', 'Braga', 'x y'
+]
+
+WORDS = ['Ana', 'Rui', 'Maria', 'Dança', 'Música', 'Canto', 'Braga', 'Porto', 'Viola', 'Bombo', 'Festa', 'Romaria']
+
+TRIALS = 300
+BENCH_ROWS = 100_000
+
+# ==================================================
+# sheets
+# ==================================================
+
+def randomCell(rng):
+    r = rng.random()
+    if r < 0.15:
+        return np.nan
+    if r < 0.18:
+        return ''
+    if r < 0.2:
+        return rng.choice([3, 2.5, True])
+    return ''.join(rng.choice(TOKENS) for _ in range(rng.randint(1, 12)))
+
+def randomSheet(rng, rows):
+    df = pd.DataFrame(
+        [[f'https://vimeo.com/{i}' + rng.choice(['', '/', ' ', '\n'])] + [randomCell(rng) for _ in SHEET_COLUMNS[1:]] for i in range(rows)],
+        columns=SHEET_COLUMNS
+    )
+
+    # all-NaN (float) and numeric columns, as pandas reads them from sparse sheets
+    if rng.random() < 0.3:
+        df['Som'] = np.nan
+    if rng.random() < 0.3:
+        df['Apoio'] = 1.0
+
+    # the sync only normalizes changed rows, so the index doesn't start at 0
+    if rng.random() < 0.3:
+        df = df.iloc[rng.randint(0, len(df) - 1):]
+
+    return df
+
+def realisticSheet(rng, rows, pool=None):
+    """
+    Sheet of delimited word lists, drawn from <pool> distinct cells when given (real sheets repeat a lot).
+    """
+    def cell():
+        if rng.random() < 0.3:
+            return np.nan
+        return rng.choice([', ', ' e ', ' & ', '\n', ',']).join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+
+    cells = [cell() for _ in range(pool)] if pool else None
+    return pd.DataFrame(
+        [[f'https://vimeo.com/{i}'] + [rng.choice(cells) if cells else cell() for _ in SHEET_COLUMNS[1:]] for i in range(rows)],
+        columns=SHEET_COLUMNS
+    )
+
+# ==================================================
+# checks
+# ==================================================
+
+def perRow(df):
+    return {index: buildProjectFields(p, cleanLink(p['Link'])) for index, p in zip(df.index, df.iloc)}
+
+def checkProperty(rng):
+    checked = 0
+
+    for _ in range(TRIALS):
+        df = randomSheet(rng, rng.randint(1, 60))
+        normalized = normalizeProjects(df).to_dict('index')
+
+        for index, expected in perRow(df).items():
+            assert list(normalized[index]) == PROJECT_FIELDS
+            assert normalized[index] == expected, (index, {
+                field: (normalized[index][field], expected[field])
+                for field in PROJECT_FIELDS if normalized[index][field] != expected[field]
+            })
+            checked += 1
+
+    print(f"property ok: {checked} rows in {TRIALS} sheets")
+
+def bench(rng):
+    for label, pool in (('random cells', None), ('repetitive sheet', 400)):
+        df = realisticSheet(rng, BENCH_ROWS, pool)
+
+        start = time.perf_counter()
+        expected = perRow(df)
+        perRowTime = time.perf_counter() - start
+
+        start = time.perf_counter()
+        normalized = normalizeProjects(df).to_dict('index')
+        bulkTime = time.perf_counter() - start
+
+        assert normalized == expected
+        print(f"{label}, {len(df)} rows: per-row {perRowTime:.2f}s, bulk {bulkTime:.2f}s ({perRowTime / bulkTime:.1f}x), identical")
+
+# ==================================================
+# main
+# ==================================================
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    rng = random.Random(int(args[0]) if args else 0)
+
+    checkProperty(rng)
+
+    if '--bench' in sys.argv:
+        bench(rng)
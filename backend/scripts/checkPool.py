@@ -0,0 +1,75 @@
+'''
+/scripts/checkPool.py
+-> concurrent raw sql readers on a cold worker never deadlock on the bounded connection pool, and a drain keeps checked out connections counted (python scripts/checkPool.py [rows])
+'''
+
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# fewer connections than concurrent readers, every one of them needs the trigram index
+os.environ.setdefault("SQL_POOL_SIZE", "2")
+os.environ.setdefault("SQL_POOL_TIMEOUT", "10")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database.setup as setup
+import database.trigramIndex as trigramIndex
+from scripts.benchSearch import buildDatabase
+
+# ==================================================
+# global vars
+# ==================================================
+
+READERS = 6
+ROUNDS = 3
+
+# seconds a round may take before the readers count as deadlocked
+ROUND_TIMEOUT = 60
+
+QUERIES = [f"SELECT * FROM projects WHERE author LIKE '%{name}%';" for name in ('carlos', 'moura', 'pires', 'cruz', 'sambado', 'tiago')]
+
+# ==================================================
+# main
+# ==================================================
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    buildDatabase(os.path.join(tempfile.mkdtemp(), 'pool.db'), rows)
+
+    executor = ThreadPoolExecutor(READERS)
+
+    for round in range(1, ROUNDS + 1):
+        # a fresh worker: no trigram index, no cached results, no open connections
+        trigramIndex.trigramIndex = None
+        setup.resultCache.clear()
+        setup.connectionPool.drain()
+
+        barrier = threading.Barrier(READERS)
+
+        def read(sql):
+            barrier.wait()
+            return setup.executeQueriesSQL([sql], ['id'])[0]
+
+        futures = [executor.submit(read, sql) for sql in QUERIES[:READERS]]
+        done, pending = wait(futures, timeout=ROUND_TIMEOUT)
+
+        if pending:
+            print(f"round {round}: {len(pending)}/{READERS} readers stuck - pool deadlock")
+            os._exit(1)
+
+        for future in done:
+            future.result()
+
+        print(f"round {round}: {READERS} readers on {setup.SQL_POOL_SIZE} connections ok, {setup.connectionPool.created} opened")
+
+    executor.shutdown()
+
+    # a drain while a reader holds a connection must not let the pool open past its size
+    held = setup.connectionPool.acquire()
+    setup.connectionPool.drain()
+    assert setup.connectionPool.created == 1, "checked out connection still counted after a drain"
+    setup.connectionPool.release(held)
+    print(f"drain with a connection checked out: {setup.connectionPool.created}/{setup.SQL_POOL_SIZE} counted")
@@ -0,0 +1,117 @@
+'''
+/scripts/checkVimeo.py
+-> batched Vimeo fetches against a local stub API: 429s, 5xx, missing videos and the concurrency bound (python scripts/checkVimeo.py [videos])
+'''
+
+import os
+import sys
+import json
+import time
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# ==================================================
+# global vars
+# ==================================================
+
+# every RATE_LIMITED-th request gets a 429, every FAILING-th a 503
+RATE_LIMITED = 4
+FAILING = 7
+
+stats = {'requests': 0, 'inFlight': 0, 'maxInFlight': 0, 'rateLimited': 0, 'failed': 0}
+statsLock = threading.Lock()
+
+# ==================================================
+# stub api
+# ==================================================
+
+def isMissing(uri):
+    # private or deleted videos are left out of the listing, like Vimeo does
+    return uri.endswith('3')
+
+class StubHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        with statsLock:
+            stats['requests'] += 1
+            stats['inFlight'] += 1
+            stats['maxInFlight'] = max(stats['maxInFlight'], stats['inFlight'])
+            number = stats['requests']
+
+        try:
+            time.sleep(0.02)
+
+            if number % RATE_LIMITED == 0:
+                stats['rateLimited'] += 1
+                self.send_response(429)
+                self.send_header('Retry-After', '0.2')
+                self.end_headers()
+                return
+
+            if number % FAILING == 0:
+                stats['failed'] += 1
+                self.send_response(503)
+                self.end_headers()
+                return
+
+            uris = parse_qs(urlparse(self.path).query)['uris'][0].split(',')
+            data = [{
+                'uri': uri,
+                'created_time': '2021-03-04T10:00:00+00:00',
+                'duration': 60,
+                'pictures': {'sizes': [{'width': 100, 'height': 75, 'link': f'https://i.vimeocdn.com{uri}.jpg'}]}
+            } for uri in uris if not isMissing(uri)]
+
+            body = json.dumps({'total': len(data), 'data': data}).encode()
+            self.send_response(200)
+            self.send_header('X-RateLimit-Remaining', '1000')
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with statsLock:
+                stats['inFlight'] -= 1
+
+# ==================================================
+# main
+# ==================================================
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # read by the vimeo module on import
+    os.environ['VIMEO_API_URL'] = f'http://127.0.0.1:{server.server_port}'
+    os.environ.setdefault('VIMEO_INITIAL_RATE', '50')
+
+    from utilities.vimeo.setup import VIMEO_BATCH_SIZE, VIMEO_WORKERS, VIDEO_NOT_FOUND, getVimeoVideos, isFinalResult
+
+    pids = list(range(1, count + 1))
+
+    start = time.perf_counter()
+    results = getVimeoVideos(pids + pids[:10])
+    elapsed = time.perf_counter() - start
+
+    missing = [pid for pid in pids if isMissing(f'/videos/{pid}')]
+
+    assert sorted(results) == pids, "every video gets a result"
+    assert all(results[pid] == VIDEO_NOT_FOUND for pid in missing), "missing videos are reported as not found"
+    assert all(isinstance(results[pid], dict) and results[pid]['id'] == pid for pid in pids if pid not in missing), "metadata of every listed video"
+    assert all(isFinalResult(result) for result in results.values()), "429s and 5xx were retried"
+    assert stats['maxInFlight'] <= VIMEO_WORKERS, "concurrency bounded by VIMEO_WORKERS"
+
+    batches = -(-count // VIMEO_BATCH_SIZE)
+    print(
+        f"{count} videos in {batches} batches: {stats['requests']} requests "
+        f"({stats['rateLimited']} rate limited, {stats['failed']} failed), "
+        f"{stats['maxInFlight']}/{VIMEO_WORKERS} in flight, {len(missing)} not found, {elapsed:.2f}s"
+    )
+
+    server.shutdown()
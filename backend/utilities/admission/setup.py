@@ -0,0 +1,189 @@
+'''
+/utilities/admission/setup.py
+-> admission control for LLM calls: global concurrency limit and bounded wait queue shared across workers
+'''
+
+from contextlib import contextmanager
+from dotenv import load_dotenv
+import threading
+import tempfile
+import time
+import os
+
+try:
+    import fcntl
+except ImportError: # not posix, fall back to a per-process limit
+    fcntl = None
+
+load_dotenv()
+
+# ==================================================
+# global vars
+# ==================================================
+
+# generations the Ollama host runs at once
+LLM_MAX_CONCURRENCY = max(1, int(os.getenv("LLM_MAX_CONCURRENCY", 2)))
+
+# requests allowed to wait for a free slot, the rest is shed right away
+LLM_MAX_QUEUE = max(1, int(os.getenv("LLM_MAX_QUEUE", 8)))
+
+# max wait for a slot (seconds) and the Retry-After sent when shedding
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", 10))
+LLM_RETRY_AFTER = int(os.getenv("LLM_RETRY_AFTER", 5))
+
+# slots and queue tickets are flock'ed files, so every gunicorn worker shares them
+LOCK_DIR = os.getenv("LLM_LOCK_DIR", os.path.join(tempfile.gettempdir(), 'lastro-llm'))
+
+localSlots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+localQueue = threading.BoundedSemaphore(LLM_MAX_QUEUE)
+
+shedCount = 0
+
+# ==================================================
+# locks
+# ==================================================
+
+class LLMOverloaded(Exception):
+    def __init__(self, message="LLM capacity exhausted", retryAfter=LLM_RETRY_AFTER):
+        super().__init__(message)
+        self.retryAfter = retryAfter
+
+class LLMBusy(LLMOverloaded):
+    # no spare slot for an optional (speculative) call, never sent to the client
+    pass
+
+def tryLockFile(kind, count):
+    """
+    Take the first free of <count> lock files. Returns its fd or None.
+    """
+    os.makedirs(LOCK_DIR, exist_ok=True)
+
+    for i in range(count):
+        fd = os.open(os.path.join(LOCK_DIR, f"{kind}-{i}.lock"), os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return fd
+        except BlockingIOError:
+            os.close(fd)
+
+    return None
+
+def releaseLockFile(fd):
+    try:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+def acquireTicket():
+    if fcntl:
+        return tryLockFile('queue', LLM_MAX_QUEUE)
+    return True if localQueue.acquire(blocking=False) else None
+
+def releaseTicket(ticket):
+    if fcntl:
+        releaseLockFile(ticket)
+    else:
+        localQueue.release()
+
+def acquireSlot():
+    if fcntl:
+        return tryLockFile('slot', LLM_MAX_CONCURRENCY)
+    return True if localSlots.acquire(blocking=False) else None
+
+def releaseSlot(slot):
+    if fcntl:
+        releaseLockFile(slot)
+    else:
+        localSlots.release()
+
+def acquireSpareSlot():
+    """
+    Take a slot only while another one stays free for requests that need it. Returns the slot or None.
+    """
+    slot = acquireSlot()
+    if slot is None:
+        return None
+
+    spare = acquireSlot()
+    if spare is None:
+        releaseSlot(slot)
+        return None
+
+    releaseSlot(spare)
+    return slot
+
+def shed(message):
+    global shedCount
+    shedCount += 1
+    print(f"DEBUG ADMISSION: {message}")
+    raise LLMOverloaded(message)
+
+# ==================================================
+# methods
+# ==================================================
+
+def waitForSlot():
+    """
+    Queue for one of the global LLM slots and return it.
+    Raises LLMOverloaded when the wait queue is full or the wait times out.
+    """
+    ticket = acquireTicket()
+    if ticket is None:
+        shed("LLM queue full - shedding request")
+
+    try:
+        deadline = time.monotonic() + LLM_QUEUE_TIMEOUT
+        delay = 0.01
+
+        while True:
+            slot = acquireSlot()
+            if slot is not None:
+                return slot
+
+            if time.monotonic() >= deadline:
+                shed("LLM queue wait timed out - shedding request")
+
+            time.sleep(delay)
+            delay = min(delay * 2, 0.2)
+    finally:
+        releaseTicket(ticket)
+
+@contextmanager
+def llmSlot(speculative=False):
+    """
+    Hold one of the global LLM slots for the duration of the block.
+    Raises LLMOverloaded when the wait queue is full or the wait times out.
+    Speculative calls never queue: they raise LLMBusy unless a slot is free with another one to spare.
+    """
+    if speculative:
+        slot = acquireSpareSlot()
+        if slot is None:
+            raise LLMBusy("no spare LLM slot - skipping speculative call")
+    else:
+        slot = waitForSlot()
+
+    try:
+        yield
+    finally:
+        releaseSlot(slot)
+
+def getAdmissionStats():
+    return {
+        "maxConcurrency": LLM_MAX_CONCURRENCY,
+        "maxQueue": LLM_MAX_QUEUE,
+        "shared": fcntl is not None,
+        "shed": shedCount
+    }
+
+# ==================================================
+# initialize on app context
+# ==================================================
+
+def initAdmission(app):
+
+    @app.errorhandler(LLMOverloaded)
+    def overloaded_handler(e):
+        return {
+            "error": "Service overloaded",
+            "message": "Too many searches right now. Please try again shortly."
+        }, 503, {"Retry-After": str(e.retryAfter)}
@@ -0,0 +1,77 @@
+'''
+/utilities/cache/setup.py
+-> bounded in-memory LRU cache (optional TTL) with hit/miss/eviction counters
+'''
+
+from collections import OrderedDict
+import threading
+import time
+
+# ==================================================
+# cache
+# ==================================================
+
+class LRUCache:
+    """
+    Thread-safe LRU cache. get() returns None on a miss, so don't store None.
+    With a ttl (seconds) entries also expire.
+    """
+
+    def __init__(self, maxSize, ttl=None):
+        self.maxSize = maxSize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expiresAt = entry
+            if expiresAt is not None and expiresAt <= time.time():
+                del self.entries[key]
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, expiresAt=None):
+        if self.maxSize <= 0:
+            return
+
+        if expiresAt is None and self.ttl is not None:
+            expiresAt = time.time() + self.ttl
+
+        with self.lock:
+            self.entries[key] = (value, expiresAt)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.maxSize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "maxSize": self.maxSize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hitRate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -4,15 +4,22 @@
 '''
 
 from apscheduler.schedulers.background import BackgroundScheduler
+from dotenv import load_dotenv
+import os
 
 from database.fetchData import fetchCSV
 
+load_dotenv()
+
 # ==================================================
 # global vars
 # ==================================================
 
 scheduler = BackgroundScheduler()
 
+# optional frequent sync in minutes (0 disables), unchanged sheets stop at the conditional GET
+CSV_SYNC_INTERVAL = int(os.getenv("CSV_SYNC_INTERVAL", 0))
+
 # ==================================================
 # methods
 # ==================================================
@@ -41,6 +48,18 @@ def initScheduler(app):
         replace_existing=True
     )
 
+    if CSV_SYNC_INTERVAL > 0:
+        scheduler.add_job(
+            func=lambda: jobToAppContext(app, fetchCSV),
+            trigger='interval',
+            minutes=CSV_SYNC_INTERVAL,
+            id='syncCSV_job',
+            name='Sync CSV Data',
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True
+        )
+
     scheduler.start()
 
 def cleanScheduler():
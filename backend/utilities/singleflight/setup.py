@@ -0,0 +1,187 @@
+'''
+/utilities/singleflight/setup.py
+-> coalesce identical concurrent requests: one leader computes, followers wait for its result (per worker and across workers)
+'''
+
+from dotenv import load_dotenv
+import threading
+import tempfile
+import hashlib
+import json
+import time
+import os
+
+try:
+    import fcntl
+except ImportError: # not posix, coalesce within the worker only
+    fcntl = None
+
+load_dotenv()
+
+# ==================================================
+# global vars
+# ==================================================
+
+# longest a follower waits for the leader (seconds), then computes on its own
+SINGLEFLIGHT_TIMEOUT = float(os.getenv("SINGLEFLIGHT_TIMEOUT", 90))
+
+# leader results are handed to other gunicorn workers through flock'ed files
+FLIGHT_DIR = os.getenv("SINGLEFLIGHT_DIR", os.path.join(tempfile.gettempdir(), 'lastro-singleflight'))
+
+# result files older than this are pruned
+RESULT_TTL = 300
+
+flights = {}
+flightsLock = threading.Lock()
+
+stats = {"leaders": 0, "followers": 0, "sharedFollowers": 0}
+statsLock = threading.Lock()
+
+# ==================================================
+# in-process flights
+# ==================================================
+
+class Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+def count(key):
+    with statsLock:
+        stats[key] += 1
+
+def buildFlightKey(*parts):
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+# ==================================================
+# cross-worker flights
+# ==================================================
+
+def flightPaths(key):
+    return (
+        os.path.join(FLIGHT_DIR, f"{key}.lock"),
+        os.path.join(FLIGHT_DIR, f"{key}.json")
+    )
+
+def readResult(resultPath, since):
+    """
+    The leader's result, only if it was written after the follower started waiting.
+    """
+    try:
+        if os.path.getmtime(resultPath) < since:
+            return None
+        with open(resultPath, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def writeResult(resultPath, result):
+    try:
+        tmpPath = f"{resultPath}.{os.getpid()}.tmp"
+        with open(tmpPath, 'w', encoding='utf-8') as f:
+            json.dump({"result": result}, f, ensure_ascii=False)
+        os.replace(tmpPath, resultPath)
+    except (OSError, TypeError, ValueError) as e:
+        print(f"DEBUG SINGLEFLIGHT: could not share result ({e})")
+
+def pruneResults():
+    cutoff = time.time() - RESULT_TTL
+    try:
+        for name in os.listdir(FLIGHT_DIR):
+            path = os.path.join(FLIGHT_DIR, name)
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+    except OSError:
+        pass
+
+def runShared(key, fn, *args, **kwargs):
+    """
+    Leader across workers: whoever holds the key's flock computes and publishes the result,
+    the others wait for the lock and read it back.
+    """
+    os.makedirs(FLIGHT_DIR, exist_ok=True)
+    lockPath, resultPath = flightPaths(key)
+
+    fd = os.open(lockPath, os.O_CREAT | os.O_RDWR, 0o600)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            # another worker leads, wait for it to finish
+            since = time.time()
+            deadline = time.monotonic() + SINGLEFLIGHT_TIMEOUT
+            delay = 0.01
+
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        print("DEBUG SINGLEFLIGHT: leader timed out - computing locally")
+                        return fn(*args, **kwargs)
+                    time.sleep(delay)
+                    delay = min(delay * 2, 0.1)
+
+            shared = readResult(resultPath, since)
+            if shared is not None:
+                count("sharedFollowers")
+                return shared["result"]
+
+            # leader failed, we hold the lock now: lead instead
+
+        result = fn(*args, **kwargs)
+        writeResult(resultPath, result)
+        pruneResults()
+        return result
+    finally:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+# ==================================================
+# methods
+# ==================================================
+
+def singleFlight(key, fn, *args, **kwargs):
+    """
+    Run fn(*args, **kwargs) once per key at a time.
+    Concurrent callers with the same key get the leader's result (or its exception, within a worker).
+    Results must be JSON serializable to be shared across workers.
+    """
+    with flightsLock:
+        flight = flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = flights[key] = Flight()
+
+    if not leader:
+        count("followers")
+        if flight.done.wait(SINGLEFLIGHT_TIMEOUT):
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        print("DEBUG SINGLEFLIGHT: leader timed out - computing locally")
+        return fn(*args, **kwargs)
+
+    count("leaders")
+    try:
+        if fcntl:
+            flight.result = runShared(key, fn, *args, **kwargs)
+        else:
+            flight.result = fn(*args, **kwargs)
+        return flight.result
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with flightsLock:
+            flights.pop(key, None)
+        flight.done.set()
+
+def getSingleFlightStats():
+    with statsLock:
+        return dict(stats, shared=fcntl is not None)
@@ -1,11 +1,16 @@
 '''
 /utilities/vimeo/setup.py
--> handle vimeo api communications
+-> handle vimeo api communications: pooled session, header-driven rate limiter, concurrent batched fetches with retries
 '''
 
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
-from datetime import datetime
+from datetime import datetime, timezone
+import threading
 import requests
+import random
+import time
 import os
 
 load_dotenv()
@@ -17,25 +22,247 @@ load_dotenv()
 # vimeo token for publish dates fetch
 VIMEO_TOKEN = os.getenv("VIMEO_TOKEN")
 
+# overridable to point syncs at a local stub server
+VIMEO_API_URL = os.getenv("VIMEO_API_URL", "https://api.vimeo.com").rstrip('/')
+
+# concurrent requests and retries per request
+VIMEO_WORKERS = max(1, int(os.getenv("VIMEO_WORKERS", 4)))
+VIMEO_MAX_RETRIES = int(os.getenv("VIMEO_MAX_RETRIES", 5))
+
+# videos per multi-URI listing request (Vimeo pages hold at most 100)
+VIMEO_BATCH_SIZE = min(100, max(1, int(os.getenv("VIMEO_BATCH_SIZE", 50))))
+
+# private or deleted videos: a final answer, cached like metadata instead of counting as a failure
+VIDEO_NOT_FOUND = "{'error': 'video not found'}"
+
+# only what the metadata cache keeps
+VIDEO_FIELDS = "uri,created_time,duration,pictures.sizes"
+
+# starting request rate (per second) until Vimeo's headers tell us better
+VIMEO_INITIAL_RATE = float(os.getenv("VIMEO_INITIAL_RATE", 5))
+
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 120.0
+REQUEST_TIMEOUT = (5, 30)
+
+session = requests.Session()
+adapter = HTTPAdapter(pool_connections=1, pool_maxsize=VIMEO_WORKERS)
+session.mount('https://', adapter)
+session.mount('http://', adapter)
+
+# ==================================================
+# rate limiter
+# ==================================================
+
+class RateLimiter:
+    """
+    Token bucket shared by the fetch threads. The refill rate follows the
+    X-RateLimit-Remaining / X-RateLimit-Reset headers, 429s pause every thread.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updatedAt = time.monotonic()
+        self.pausedUntil = 0.0
+        self.lock = threading.Lock()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updatedAt) * self.rate)
+        self.updatedAt = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.refill(now)
+
+                if now < self.pausedUntil:
+                    wait = self.pausedUntil - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self.lock:
+            self.pausedUntil = max(self.pausedUntil, time.monotonic() + seconds)
+            self.tokens = 0
+
+    def update(self, headers):
+        """
+        Spread the remaining quota evenly until the window resets.
+        """
+        remaining = headers.get('X-RateLimit-Remaining')
+        if remaining is None:
+            return
+
+        try:
+            remaining = int(remaining)
+        except ValueError:
+            return
+
+        window = secondsUntilReset(headers) or 60.0
+
+        with self.lock:
+            self.refill(time.monotonic())
+            self.rate = max(remaining, 1) / max(window, 1.0)
+            self.capacity = max(1.0, min(float(remaining), VIMEO_WORKERS))
+            self.tokens = min(self.tokens, float(remaining))
+
+        if remaining <= 0:
+            self.pause(window)
+
+limiter = RateLimiter(VIMEO_INITIAL_RATE)
+
+def secondsUntilReset(headers):
+    reset = headers.get('X-RateLimit-Reset')
+    if not reset:
+        return None
+
+    try:
+        resetAt = datetime.fromisoformat(reset.replace("Z", "+00:00"))
+        if resetAt.tzinfo is None:
+            resetAt = resetAt.replace(tzinfo=timezone.utc)
+        return max(0.0, (resetAt - datetime.now(timezone.utc)).total_seconds())
+    except ValueError:
+        return None
+
+def backoff(attempt):
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * (0.5 + random.random() / 2)
+
+def retryDelay(response, attempt):
+    """
+    Retry-After, then the window reset, then exponential backoff.
+    """
+    retryAfter = response.headers.get('Retry-After')
+    if retryAfter:
+        try:
+            return float(retryAfter)
+        except ValueError:
+            pass
+
+    reset = secondsUntilReset(response.headers)
+    if reset:
+        return min(reset, BACKOFF_MAX)
+
+    return backoff(attempt)
+
 # ==================================================
 # methods
 # ==================================================
 
-def getVimeoDate(pid):
-    url = f"https://api.vimeo.com/videos/{pid}"
+def parseVideo(video):
+    """
+    Metadata kept from a Vimeo video object: created date, duration and thumbnail sizes.
+    """
+    created = video.get("created_time")
+    sizes = (video.get("pictures") or {}).get("sizes") or []
+
+    return {
+        'id': int(video["uri"].rstrip('/').split('/')[-1]),
+        'createdDate': datetime.fromisoformat(created.replace("Z", "+00:00")).date() if created else None,
+        'duration': video.get("duration"),
+        'thumbnails': [
+            {'width': size.get("width"), 'height': size.get("height"), 'link': size.get("link")}
+            for size in sizes if size.get("link")
+        ]
+    }
+
+def isFinalResult(result):
+    """
+    Whether a lookup result is an answer (metadata or video not found) rather than a failure worth retrying.
+    """
+    return isinstance(result, dict) or result == VIDEO_NOT_FOUND
+
+def fetchVideoBatch(pids):
+    """
+    Metadata of up to VIMEO_BATCH_SIZE videos in one multi-URI listing request, retried on 429 / 5xx / network errors.
+    Returns ({pid: metadata or error string}, transient) where transient marks errors worth retrying later.
+    """
+    url = f"{VIMEO_API_URL}/videos"
     headers = {
         "Authorization": f"bearer {VIMEO_TOKEN}"
     }
+    params = {
+        "uris": ','.join(f"/videos/{pid}" for pid in pids),
+        "fields": VIDEO_FIELDS,
+        "per_page": len(pids)
+    }
+
+    error = "RATE_LIMIT_EXCEEDED"
+
+    for attempt in range(VIMEO_MAX_RETRIES + 1):
+        limiter.acquire()
+
+        try:
+            response = session.get(url, headers=headers, params=params, timeout=REQUEST_TIMEOUT)
+        except requests.RequestException as e:
+            print(f"Vimeo request failed ({len(pids)} videos): {e}")
+            error = f"{{'error': '{e}'}}"
+            time.sleep(backoff(attempt))
+            continue
+
+        limiter.update(response.headers)
+
+        if response.status_code == 200:
+            videos = {}
+            for video in response.json().get("data") or []:
+                try:
+                    metadata = parseVideo(video)
+                except (KeyError, ValueError, AttributeError):
+                    continue
+                videos[metadata['id']] = metadata
+
+            # private or deleted videos are just left out of the listing
+            return {pid: videos.get(pid, VIDEO_NOT_FOUND) for pid in pids}, False
+        elif response.status_code == 429: # Rate limit exceeded
+            delay = retryDelay(response, attempt)
+            print(f"Vimeo API rate limit exceeded — 429, pausing {delay:.1f}s")
+            limiter.pause(delay)
+            error = "RATE_LIMIT_EXCEEDED"
+        elif response.status_code >= 500:
+            print(f"Vimeo API error {response.status_code} ({len(pids)} videos), retrying")
+            error = f"{{'error': 'HTTP {response.status_code}'}}"
+            time.sleep(backoff(attempt))
+        else:
+            try:
+                body = response.json()
+            except ValueError:
+                body = {"error": f"HTTP {response.status_code}"}
+            print("Error:", body)
+            return {pid: f"{body}" for pid in pids}, False
+
+    return {pid: error for pid in pids}, True
+
+def getVimeoVideos(pids):
+    """
+    Fetch metadata for many videos: batches of VIMEO_BATCH_SIZE, run concurrently
+    (bounded by VIMEO_WORKERS and the shared limiter). Batches failing with transient
+    errors are retried once more at the end.
+    Returns {pid: metadata dict or error string}.
+    """
+    pids = list(dict.fromkeys(pids))
+    if not pids:
+        return {}
+
+    batches = [pids[i:i + VIMEO_BATCH_SIZE] for i in range(0, len(pids), VIMEO_BATCH_SIZE)]
+    results = {}
+
+    with ThreadPoolExecutor(max_workers=VIMEO_WORKERS, thread_name_prefix='vimeo') as executor:
+        failed = []
+        for batch, (videos, transient) in zip(batches, executor.map(fetchVideoBatch, batches)):
+            results.update(videos)
+            if transient:
+                failed.append(batch)
+
+        if failed:
+            print(f"Retrying {len(failed)} failed Vimeo batches")
+            for videos, _ in executor.map(fetchVideoBatch, failed):
+                results.update(videos)
 
-    response = requests.get(url, headers=headers)
-
-    if response.status_code == 200:
-        data = response.json()
-        dt = datetime.fromisoformat(data.get("created_time").replace("Z", "+00:00"))
-        return dt.date()
-    elif response.status_code == 429: # Rate limit exceeded
-        print("Vimeo API rate limit exceeded — 429")
-        return "RATE_LIMIT_EXCEEDED"
-    else:
-        print("Error:", response.json())
-        return f"{response.json()}"
\ No newline at end of file
+    return results
@@ -42,8 +42,14 @@ const PromptBar = () => {
           .map((msg) => msg.queries?.[0] || ""),
         currentPrompt: prompt,
         currentProjectId,
+        sessionId: sessionStorage.getItem("lastro-sessionId") ?? undefined,
       });
 
+      // Follow-ups in the same session continue from the model's previous context
+      if (response.sessionId) {
+        sessionStorage.setItem("lastro-sessionId", response.sessionId);
+      }
+
       addMessage({
         prompt,
         queries: response.queries,
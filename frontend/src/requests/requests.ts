@@ -22,6 +22,7 @@ export async function sendQuery(data: {
   previousQueries: string[];
   currentPrompt: string;
   currentProjectId?: string;
+  sessionId?: string;
 }): Promise<QueryResponse> {
   return postRequest<QueryResponse>("/query", data);
 }
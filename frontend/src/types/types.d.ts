@@ -51,4 +51,5 @@ interface QueryResponse {
   descriptions: string[];
   results: Projects[];
   contextProject?: ContextProject;
+  sessionId?: string;
 }